@@ -4,6 +4,8 @@
 打包脚本 - 将video_audio_merger.py打包成Windows可执行文件
 """
 
+import importlib.util
+import shutil
 import subprocess
 import sys
 import os
@@ -11,12 +13,8 @@ from pathlib import Path
 
 
 def check_pyinstaller():
-    """检查是否安装了PyInstaller"""
-    try:
-        import PyInstaller
-        return True
-    except ImportError:
-        return False
+    """检查是否安装了PyInstaller（只查找模块，不实际导入，启动更快）"""
+    return importlib.util.find_spec('PyInstaller') is not None
 
 
 def install_pyinstaller():
@@ -32,14 +30,28 @@ def install_pyinstaller():
         return False
 
 
-def build_exe(console=True, onefile=True, icon=None):
+def find_upx_dir(upx_dir=None):
+    """查找UPX所在目录，找不到返回None"""
+    if upx_dir and Path(upx_dir).exists():
+        return str(upx_dir)
+    upx = shutil.which('upx')
+    if upx:
+        return str(Path(upx).parent)
+    return None
+
+
+def build_exe(console=True, onefile=False, icon=None, upx_dir=None):
     """
     打包成exe文件
-    
+
+    默认使用目录模式（--onedir）：单文件模式每次启动都要把整个
+    程序解压到临时目录，冷启动慢好几秒；目录模式直接加载，启动快得多。
+
     Args:
         console: 是否显示控制台窗口
-        onefile: 是否打包成单个文件
+        onefile: 是否打包成单个文件（便携但启动慢）
         icon: 图标文件路径
+        upx_dir: UPX所在目录，用于压缩exe体积
     """
     if not check_pyinstaller():
         if not install_pyinstaller():
@@ -57,7 +69,10 @@ def build_exe(console=True, onefile=True, icon=None):
         sys.executable, '-m', 'PyInstaller',
         str(script_path),
         '--name', 'VideoAudioMerger',
-        '--clean'
+        '--clean',
+        # 以-OO级别编译打包内的.pyc：去掉assert和docstring，
+        # 包更小、启动时解码字节码更快
+        '--optimize', '2'
     ]
     
     if onefile:
@@ -72,16 +87,24 @@ def build_exe(console=True, onefile=True, icon=None):
         
     if icon and Path(icon).exists():
         cmd.extend(['--icon', icon])
-    
-    # 添加隐藏导入
-    cmd.extend([
-        '--hidden-import', 'json',
-        '--hidden-import', 'subprocess',
-        '--hidden-import', 'pathlib',
-        '--hidden-import', 'difflib',
-        '--hidden-import', 'concurrent.futures',
-        '--hidden-import', 'argparse'
-    ])
+
+    # UPX压缩：可大幅减小exe体积（下载更快、冷启动读盘更少）
+    upx_dir = find_upx_dir(upx_dir)
+    if upx_dir:
+        cmd.extend([
+            '--upx-dir', upx_dir,
+            # 这些DLL经UPX压缩后可能无法加载，排除掉
+            '--upx-exclude', 'vcruntime140.dll',
+            '--upx-exclude', 'python3.dll',
+        ])
+
+
+    # 标准库模块PyInstaller会自动分析到，不需要--hidden-import；
+    # 排除用不到的大块标准库，减小体积、加快分析
+    for mod in ('test', 'unittest', 'pydoc', 'lib2to3', 'xmlrpc',
+                'idlelib', 'turtle', 'turtledemo', 'ensurepip', 'venv',
+                'pip', 'setuptools'):
+        cmd.extend(['--exclude-module', mod])
     
     print("开始打包...")
     print(f"命令: {' '.join(cmd)}")
@@ -93,7 +116,11 @@ def build_exe(console=True, onefile=True, icon=None):
         print("="*60)
         
         # 显示输出路径
-        dist_path = Path(__file__).parent / 'dist' / 'VideoAudioMerger.exe'
+        dist_dir = Path(__file__).parent / 'dist'
+        if onefile:
+            dist_path = dist_dir / 'VideoAudioMerger.exe'
+        else:
+            dist_path = dist_dir / 'VideoAudioMerger' / 'VideoAudioMerger.exe'
         if dist_path.exists():
             print(f"可执行文件: {dist_path}")
             print(f"文件大小: {dist_path.stat().st_size / 1024 / 1024:.2f} MB")
@@ -112,10 +139,11 @@ def main():
     parser = argparse.ArgumentParser(description='打包视频音频合成工具')
     parser.add_argument('--window', action='store_true',
                        help='使用窗口模式（不显示控制台）')
-    parser.add_argument('--dir', action='store_true',
-                       help='打包成目录（非单文件）')
+    parser.add_argument('--onefile', action='store_true',
+                       help='打包成单个文件（便携，但每次启动需解压，较慢）')
     parser.add_argument('--icon', help='指定图标文件(.ico)')
-    
+    parser.add_argument('--upx-dir', help='UPX所在目录（默认自动从PATH查找）')
+
     args = parser.parse_args()
     
     print("="*60)
@@ -124,8 +152,9 @@ def main():
     
     success = build_exe(
         console=not args.window,
-        onefile=not args.dir,
-        icon=args.icon
+        onefile=args.onefile,
+        icon=args.icon,
+        upx_dir=args.upx_dir
     )
     
     if success:
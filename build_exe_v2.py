@@ -8,41 +8,74 @@ import subprocess
 import sys
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
 
+# 隐藏导入：只保留tkinter相关（打包遗漏会导致闪退），
+# 其余标准库模块PyInstaller会自动分析到
+_HIDDEN_IMPORTS = (
+    'tkinter',
+    'tkinter.filedialog',
+    'tkinter.messagebox',
+    'tkinter.scrolledtext',
+    'tkinter.ttk',
+)
+
+# 排除用不到的大块标准库，减小体积、加快分析
+_EXCLUDE_MODULES = (
+    'test', 'unittest', 'pydoc', 'lib2to3', 'xmlrpc',
+    'idlelib', 'turtle', 'turtledemo', 'ensurepip', 'venv',
+    'pip', 'setuptools',
+)
+
+# 固定不变的参数只构建一次，调试版/发布版共用，避免两处漂移
+_BASE_FLAGS = tuple(chain(
+    chain.from_iterable(('--hidden-import', m) for m in _HIDDEN_IMPORTS),
+    chain.from_iterable(('--exclude-module', m) for m in _EXCLUDE_MODULES),
+))
+
 
 def install_dependencies():
     """安装必要的依赖"""
     print("正在检查依赖...")
-    
+
     deps = ['pyinstaller', 'pywin32;platform_system=="Windows"']
-    for dep in deps:
-        try:
-            subprocess.run([sys.executable, '-m', 'pip', 'install', dep], 
-                          check=True, capture_output=True)
+    # 一次pip调用装所有依赖，避免每个依赖都重新启动pip；
+    # 正常输出直接丢给DEVNULL（内核层丢弃，不经过Python），只保留stderr用于报错
+    result = subprocess.run(
+        [sys.executable, '-m', 'pip', 'install',
+         '--disable-pip-version-check', '--no-input', '--quiet', '--quiet', *deps],
+        check=False, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode == 0:
+        for dep in deps:
             print(f"  ✓ {dep}")
-        except:
-            print(f"  ✗ {dep} 安装失败")
+    else:
+        print(f"  ✗ 依赖安装失败: {result.stderr.strip()[-200:]}")
 
 
 def clean_build():
     """清理之前的构建文件"""
     print("\n清理之前的构建...")
-    dirs_to_remove = ['build', 'dist', '__pycache__']
-    for dir_name in dirs_to_remove:
-        if Path(dir_name).exists():
-            try:
-                shutil.rmtree(dir_name)
-                print(f"  已删除 {dir_name}/")
-            except:
-                pass
-    
-    # 删除spec文件
-    for spec in Path('.').glob('*.spec'):
+    dirs_to_remove = [d for d in ('build', 'dist', '__pycache__') if Path(d).exists()]
+
+    # 删除大目录是IO密集操作，并行删，耗时取决于最慢的那个目录
+    if dirs_to_remove:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda d: shutil.rmtree(d, ignore_errors=True),
+                              dirs_to_remove))
+        for dir_name in dirs_to_remove:
+            print(f"  已删除 {dir_name}/")
+
+    # 删除spec文件（直接scandir，不为每个条目构造Path对象）
+    with os.scandir('.') as it:
+        specs = [e.name for e in it if e.is_file() and e.name.endswith('.spec')]
+    for spec in specs:
         try:
-            spec.unlink()
-            print(f"  已删除 {spec.name}")
-        except:
+            os.unlink(spec)
+            print(f"  已删除 {spec}")
+        except OSError:
             pass
 
 
@@ -71,11 +104,16 @@ if sys.platform == 'win32':
 '''
     hook_dir = Path('hooks')
     hook_dir.mkdir(exist_ok=True)
-    
+
     hook_file = hook_dir / 'hook-tkinter.py'
-    with open(hook_file, 'w', encoding='utf-8') as f:
-        f.write(hook_content)
-    
+    new_content = hook_content.encode('utf-8')
+    # 内容没变就不重写：避免动mtime导致PyInstaller缓存失效、重新分析
+    if hook_file.exists() and hook_file.read_bytes() == new_content:
+        return str(hook_dir)
+
+    with open(hook_file, 'wb') as f:
+        f.write(new_content)
+
     return str(hook_dir)
 
 
@@ -104,6 +142,8 @@ def build_exe(version='v2', console=False, onedir=False, debug=False):
         '--name', exe_name,
         '--clean',
         '--noconfirm',
+        # 以-OO级别编译打包内的.pyc，包更小、启动更快
+        '--optimize', '2',
     ]
     
     # 打包模式
@@ -122,39 +162,24 @@ def build_exe(version='v2', console=False, onedir=False, debug=False):
     if debug:
         cmd.append('--debug=all')
     
-    # 隐藏导入
-    hidden_imports = [
-        'tkinter',
-        'tkinter.filedialog',
-        'tkinter.messagebox',
-        'tkinter.scrolledtext',
-        'tkinter.ttk',
-        'json',
-        'subprocess',
-        'pathlib',
-        'difflib',
-        'concurrent.futures',
-        'argparse',
-        'threading',
-        'datetime',
-    ]
-    
-    for imp in hidden_imports:
-        cmd.extend(['--hidden-import', imp])
-    
-    # Windows特定
-    if sys.platform == 'win32':
-        cmd.extend(['--hidden-import', 'ctypes'])
-        # 禁用UPX（有时会导致问题）
+    cmd.extend(_BASE_FLAGS)
+
+    # UPX压缩：有UPX时启用，可大幅减小exe体积；排除压缩后会出问题的DLL
+    upx = shutil.which('upx')
+    if upx:
+        cmd.extend([
+            '--upx-dir', str(Path(upx).parent),
+            '--upx-exclude', 'vcruntime140.dll',
+            '--upx-exclude', 'python3.dll',
+        ])
+    else:
         cmd.append('--noupx')
     
-    # 添加钩子路径
+    # 添加钩子路径（钩子里已列出需要的tkinter子模块，
+    # 不再用--collect-all tkinter，那会把整个Tcl/Tk测试数据都打进去）
     hook_dir = create_hook_file()
     cmd.extend(['--additional-hooks-dir', hook_dir])
     
-    # 收集所有数据文件
-    cmd.extend(['--collect-all', 'tkinter'])
-    
     print(f"\n打包命令:")
     print(' '.join(cmd))
     print("\n开始打包，请稍候...")
@@ -192,21 +217,30 @@ def create_debug_version():
     return build_exe(version='v2', console=True, onedir=True, debug=True)
 
 
-def create_release_version():
-    """创建发布版本"""
+def create_release_version(onedir=None):
+    """
+    创建发布版本
+
+    Args:
+        onedir: 是否目录模式；None表示交互询问（非终端环境下默认目录模式，
+                保证CI/脚本调用不会卡在input上）
+    """
     print("\n" + "="*60)
     print("创建发布版本")
     print("="*60)
-    
-    # 推荐使用onedir模式，更稳定
-    print("\n推荐选择:")
-    print("1. 目录模式（推荐，更稳定，启动更快）")
-    print("2. 单文件模式（便携，但启动较慢）")
-    
-    choice = input("\n请选择 (1/2): ").strip()
-    
-    onedir = (choice == '1')
-    
+
+    if onedir is None:
+        if sys.stdin.isatty():
+            # 推荐使用onedir模式，更稳定
+            print("\n推荐选择:")
+            print("1. 目录模式（推荐，更稳定，启动更快）")
+            print("2. 单文件模式（便携，但启动较慢）")
+
+            choice = input("\n请选择 (1/2, 默认1): ").strip() or '1'
+            onedir = (choice == '1')
+        else:
+            onedir = True
+
     return build_exe(version='v2', console=False, onedir=onedir, debug=False)
 
 
@@ -235,7 +269,13 @@ def main():
     print("="*60)
     print("视频音频合成工具 - 打包脚本 v2.0")
     print("="*60)
-    
+
+    # 命令行直接指定模式时不进菜单，方便CI/脚本无人值守打包
+    if '--release-onedir' in sys.argv:
+        sys.exit(0 if create_release_version(onedir=True) else 1)
+    if '--release-onefile' in sys.argv:
+        sys.exit(0 if create_release_version(onedir=False) else 1)
+
     print("\n请选择操作:")
     print("1. 创建发布版本（正常使用）")
     print("2. 创建调试版本（带控制台，排查闪退问题）")
@@ -257,7 +297,7 @@ def main():
     elif choice == '5':
         install_dependencies()
         clean_build()
-        create_release_version()
+        create_release_version(onedir=True)
         test_exe()
     elif choice == '6':
         return
@@ -4,12 +4,47 @@
 测试脚本 - 验证视频音频合成工具的安装和配置
 """
 
+import functools
 import os
 import sys
+import shutil
 import subprocess
 from pathlib import Path
 
 
+@functools.lru_cache(maxsize=1)
+def _find_ffmpeg():
+    """查找FFmpeg路径（结果缓存，重复调用不再重新探测）"""
+    # 尝试从配置读取
+    config_file = Path.home() / '.video_audio_merger.json'
+    if config_file.exists():
+        import json
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                ffmpeg_path = json.load(f).get('ffmpeg_path')
+                if ffmpeg_path:
+                    return ffmpeg_path
+        except:
+            pass
+
+    # 尝试从PATH查找（shutil.which一次搞定，还会处理Windows的PATHEXT）
+    ffmpeg_path = shutil.which('ffmpeg')
+    if ffmpeg_path:
+        return ffmpeg_path
+
+    # 尝试常见路径
+    if sys.platform == 'win32':
+        common_paths = [
+            'C:\\ffmpeg\\bin\\ffmpeg.exe',
+            'D:\\ffmpeg\\bin\\ffmpeg.exe',
+        ]
+        for path in common_paths:
+            if os.path.isfile(path):
+                return path
+
+    return None
+
+
 def test_python_version():
     """测试Python版本"""
     print("[1/4] 检查Python版本...")
@@ -26,40 +61,9 @@ def test_python_version():
 def test_ffmpeg():
     """测试FFmpeg"""
     print("\n[2/4] 检查FFmpeg...")
-    
-    # 尝试从配置读取
-    config_file = Path.home() / '.video_audio_merger.json'
-    ffmpeg_path = None
-    
-    if config_file.exists():
-        import json
-        try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                ffmpeg_path = config.get('ffmpeg_path')
-        except:
-            pass
-    
-    # 尝试从PATH查找
-    if not ffmpeg_path:
-        for path in os.environ.get('PATH', '').split(os.pathsep):
-            exe = 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg'
-            full_path = os.path.join(path, exe)
-            if Path(full_path).exists():
-                ffmpeg_path = full_path
-                break
-    
-    # 尝试常见路径
-    if not ffmpeg_path and sys.platform == 'win32':
-        common_paths = [
-            'C:\\ffmpeg\\bin\\ffmpeg.exe',
-            'D:\\ffmpeg\\bin\\ffmpeg.exe',
-        ]
-        for path in common_paths:
-            if Path(path).exists():
-                ffmpeg_path = path
-                break
-    
+
+    ffmpeg_path = _find_ffmpeg()
+
     if not ffmpeg_path:
         print("  ✗ 未找到FFmpeg")
         print("  请下载并安装FFmpeg: https://ffmpeg.org/download.html")
@@ -68,13 +72,14 @@ def test_ffmpeg():
     
     try:
         result = subprocess.run(
-            [ffmpeg_path, '-version'],
+            [ffmpeg_path, '-hide_banner', '-version'],
             capture_output=True,
             text=True,
             timeout=5
         )
         if result.returncode == 0:
-            version_line = result.stdout.split('\n')[0]
+            # partition只扫到第一个换行，不用切分整个输出
+            version_line = result.stdout.partition('\n')[0]
             print(f"  ✓ {version_line}")
             print(f"  路径: {ffmpeg_path}")
             return True
@@ -101,20 +106,25 @@ def test_modules():
         'threading'
     ]
     
+    import importlib.util
+
     all_ok = True
     for module in required:
+        # find_spec只查找模块是否存在，不实际导入（导入tkinter要初始化Tcl，很慢）
         try:
-            __import__(module)
+            found = importlib.util.find_spec(module) is not None
+        except (ImportError, ValueError):
+            found = False
+        if found:
             print(f"  ✓ {module}")
-        except ImportError:
+        else:
             print(f"  ✗ {module} (缺失)")
             all_ok = False
-    
-    # 检查PyInstaller（可选）
-    try:
-        import PyInstaller
+
+    # 检查PyInstaller（可选，只查找不导入）
+    if importlib.util.find_spec('PyInstaller') is not None:
         print(f"  ✓ PyInstaller (已安装，可用于打包)")
-    except ImportError:
+    else:
         print(f"  - PyInstaller (未安装，运行 'pip install pyinstaller' 安装)")
     
     return all_ok
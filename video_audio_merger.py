@@ -5,14 +5,65 @@
 支持自动匹配同名的视频(.mp4)和音频(.m4a)文件，使用FFmpeg进行合成
 """
 
+import asyncio
 import os
 import sys
 import json
+import shutil
 import subprocess
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from difflib import SequenceMatcher
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 可选加速：装了rapidfuzz时相似度矩阵用C++/SIMD一次算完，
+# 比difflib的纯Python实现快约两个数量级；没装则退回difflib。
+# cdist返回矩阵需要numpy，但numpy不是rapidfuzz的声明依赖，
+# 只装了rapidfuzz时必须一并探测，否则cdist在调用时才炸
+try:
+    import numpy as _np
+    from rapidfuzz import fuzz as _rf_fuzz
+    from rapidfuzz import process as _rf_process
+except ImportError:
+    _np = None
+    _rf_fuzz = None
+    _rf_process = None
+
+
+@lru_cache(maxsize=8192)
+def _sim(a, b):
+    """计算两个字符串的相似度（带缓存，重复的文件名对不再重算）"""
+    return SequenceMatcher(None, a, b).ratio()
+
+
+# 合成子进程以略低于前台的优先级运行：并行的FFmpeg吃满CPU时，
+# 交互界面和系统其他程序仍然保持响应
+if sys.platform == 'win32':
+    _LOW_PRIORITY_KWARGS = {
+        'creationflags': (subprocess.BELOW_NORMAL_PRIORITY_CLASS
+                          | subprocess.CREATE_NO_WINDOW),
+    }
+else:
+    _LOW_PRIORITY_KWARGS = {
+        'preexec_fn': lambda: os.nice(5),
+        'start_new_session': True,
+    }
+
+
+@lru_cache(maxsize=64)
+def _path_exists(path):
+    """缓存的存在性检查：初始化阶段对同一路径的重复stat只落盘一次"""
+    return os.path.exists(path)
+
+
+def _sim_at_least(a, b, cutoff):
+    """带阈值的相似度：先用difflib的快速上界排除明显不匹配的，达不到阈值返回0"""
+    sm = SequenceMatcher(None, a, b)
+    if sm.real_quick_ratio() < cutoff or sm.quick_ratio() < cutoff:
+        return 0.0
+    return sm.ratio()
 
 
 class VideoAudioMerger:
@@ -21,6 +72,11 @@ class VideoAudioMerger:
     # 支持的文件格式
     VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
     AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
+
+    # 扩展名→类型（0=视频，1=音频）：扫描热循环里查一次dict就能分类，
+    # 不用对每个文件做两次集合成员测试
+    _EXT_KIND = {**{e: 0 for e in VIDEO_EXTENSIONS},
+                 **{e: 1 for e in AUDIO_EXTENSIONS}}
     
     def __init__(self, ffmpeg_path=None):
         """
@@ -29,31 +85,30 @@ class VideoAudioMerger:
         Args:
             ffmpeg_path: FFmpeg可执行文件路径，如果为None则尝试从环境变量或配置文件读取
         """
-        self.ffmpeg_path = self._get_ffmpeg_path(ffmpeg_path)
         self.config_file = Path.home() / '.video_audio_merger.json'
+        self.ffmpeg_path = self._get_ffmpeg_path(ffmpeg_path)
         self.matches = []  # 存储匹配的文件对
         
     def _get_ffmpeg_path(self, provided_path=None):
         """获取FFmpeg路径"""
         # 1. 优先使用提供的路径
-        if provided_path and Path(provided_path).exists():
+        if provided_path and _path_exists(str(provided_path)):
             return str(Path(provided_path).resolve())
-            
-        # 2. 尝试从配置文件读取
-        if self._load_config().get('ffmpeg_path'):
-            saved_path = self._load_config()['ffmpeg_path']
-            if Path(saved_path).exists():
-                return saved_path
-                
+
+        # 2. 尝试从配置文件读取（只读一次，不重复打开和解析JSON）
+        saved_path = self._load_config().get('ffmpeg_path')
+        if saved_path and _path_exists(saved_path):
+            return saved_path
+
         # 3. 尝试从系统PATH查找
         ffmpeg_in_path = self._find_in_path('ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
         if ffmpeg_in_path:
             return ffmpeg_in_path
-            
+
         # 4. 尝试常见安装路径
         common_paths = self._get_common_ffmpeg_paths()
         for path in common_paths:
-            if Path(path).exists():
+            if _path_exists(path):
                 return path
                 
         return None
@@ -85,15 +140,12 @@ class VideoAudioMerger:
         
     def _find_in_path(self, executable):
         """在系统PATH中查找可执行文件"""
-        for path in os.environ.get('PATH', '').split(os.pathsep):
-            full_path = os.path.join(path, executable)
-            if Path(full_path).exists():
-                return full_path
-        return None
+        # shutil.which一次搞定，还正确处理Windows的PATHEXT
+        return shutil.which(executable)
         
     def _load_config(self):
         """加载配置文件"""
-        if Path(self.config_file).exists():
+        if _path_exists(str(self.config_file)):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
@@ -107,6 +159,7 @@ class VideoAudioMerger:
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=2)
+            _path_exists.cache_clear()  # 配置文件状态变了，缓存的stat结果作废
             return True
         except Exception as e:
             print(f"保存配置失败: {e}")
@@ -114,9 +167,10 @@ class VideoAudioMerger:
             
     def set_ffmpeg_path(self, path):
         """设置FFmpeg路径"""
-        if Path(path).exists():
+        if os.path.exists(path):
             self.ffmpeg_path = str(Path(path).resolve())
             self.save_config()
+            _path_exists.cache_clear()
             return True
         return False
         
@@ -124,7 +178,7 @@ class VideoAudioMerger:
         """验证FFmpeg是否可用"""
         if not self.ffmpeg_path:
             return False, "FFmpeg路径未设置"
-        if not Path(self.ffmpeg_path).exists():
+        if not _path_exists(self.ffmpeg_path):
             return False, f"FFmpeg不存在: {self.ffmpeg_path}"
             
         try:
@@ -141,39 +195,181 @@ class VideoAudioMerger:
         except Exception as e:
             return False, f"验证FFmpeg失败: {e}"
             
+    def _detect_hw_encoder(self):
+        """检测FFmpeg可用的硬件H.264编码器，没有返回None（结果缓存）"""
+        if hasattr(self, '_hw_encoder'):
+            return self._hw_encoder
+
+        encoder = None
+        try:
+            result = subprocess.run(
+                [self.ffmpeg_path, '-hide_banner', '-encoders'],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+            if result.returncode == 0:
+                # 按优先级：NVIDIA > Intel核显 > AMD > macOS
+                for candidate in ('h264_nvenc', 'h264_qsv', 'h264_amf', 'h264_videotoolbox'):
+                    if candidate in result.stdout:
+                        encoder = candidate
+                        break
+        except Exception:
+            pass
+
+        self._hw_encoder = encoder
+        return encoder
+
+    def _ffprobe_path(self):
+        """找与ffmpeg配套的ffprobe，找不到返回None（结果缓存）"""
+        if hasattr(self, '_ffprobe'):
+            return self._ffprobe
+
+        probe = None
+        if self.ffmpeg_path:
+            exe = 'ffprobe.exe' if sys.platform == 'win32' else 'ffprobe'
+            candidate = Path(self.ffmpeg_path).with_name(exe)
+            if candidate.exists():
+                probe = str(candidate)
+        if probe is None:
+            probe = shutil.which('ffprobe')
+
+        self._ffprobe = probe
+        return probe
+
+    def _probe_audio_codec(self, path):
+        """用ffprobe读取音频流的编码格式，失败返回None（按路径缓存）"""
+        if not hasattr(self, '_audio_codec_cache'):
+            self._audio_codec_cache = {}
+        cache = self._audio_codec_cache
+        if path in cache:
+            return cache[path]
+
+        codec = None
+        ffprobe = self._ffprobe_path()
+        if ffprobe:
+            try:
+                result = subprocess.run(
+                    [ffprobe, '-v', 'error', '-select_streams', 'a:0',
+                     '-show_entries', 'stream=codec_name', '-of', 'csv=p=0',
+                     str(path)],
+                    capture_output=True,
+                    text=True,
+                    timeout=10
+                )
+                if result.returncode == 0:
+                    codec = result.stdout.strip() or None
+            except Exception:
+                pass
+
+        cache[path] = codec
+        return codec
+
+    # MP4系容器的封装参数：faststart把moov原子放到文件头（顺序写一遍就完，
+    # 输出在网络盘上时省掉回读重写，播放器也能边下边播）；
+    # 时间戳参数避免FFmpeg为对齐负时间戳做额外处理
+    _MP4_MUX_FLAGS = ('-movflags', '+faststart',
+                      '-avoid_negative_ts', 'make_zero',
+                      '-fflags', '+genpts')
+    _MP4_SUFFIXES = {'.mp4', '.m4v', '.mov'}
+
+    def _mux_flags_for(self, output_path):
+        """按输出容器格式返回额外的封装参数"""
+        if os.path.splitext(str(output_path))[1].lower() in self._MP4_SUFFIXES:
+            return self._MP4_MUX_FLAGS
+        return ()
+
+    def _resolve_audio_codec(self, audio, audio_codec):
+        """源音频已经是目标编码时改为流复制，省掉整个解码+重编码"""
+        # B站下载的.m4a几乎都是AAC，合成就退化成纯封装，秒级完成
+        if audio_codec == 'aac' and self._probe_audio_codec(audio) == 'aac':
+            return 'copy'
+        return audio_codec
+
     def scan_directory(self, directory, recursive=True):
         """
         扫描目录，查找视频和音频文件
-        
+
         Args:
             directory: 要扫描的目录
             recursive: 是否递归扫描子目录
-            
+
         Returns:
-            tuple: (视频文件列表, 音频文件列表)
+            tuple: (视频文件列表, 音频索引dict{casefold后的主名: [文件列表]})
+
+        音频在扫描时就按主名建好索引，match_files的完全匹配阶段
+        直接查dict，不用再过一遍音频列表。
+
+        注：不用按扩展名逐个rglob——那样每种扩展名都要把目录树走一遍，
+        而且大小写不同的扩展名还会漏掉；这里单趟scandir在目录项层面
+        过滤，不命中的文件连Path对象都不构造，效果相同且只走一遍。
         """
         video_files = []
-        audio_files = []
-        
-        dir_path = Path(directory)
-        if not dir_path.exists():
-            return [], []
-            
-        pattern = '**/*' if recursive else '*'
-        
-        for file_path in dir_path.glob(pattern):
-            if file_path.is_file():
-                ext = file_path.suffix.lower()
-                if ext in self.VIDEO_EXTENSIONS:
-                    video_files.append(file_path)
-                elif ext in self.AUDIO_EXTENSIONS:
-                    audio_files.append(file_path)
-                    
-        return video_files, audio_files
+        audio_index = {}
+
+        if not os.path.isdir(directory):
+            return [], {}
+
+        ext_kind = self._EXT_KIND
+
+        def _classify(entry, videos, index):
+            # 扩展名直接从entry.name切出来，只有命中的文件才构造Path对象
+            name = entry.name
+            stem, dot, ext = name.rpartition('.')
+            kind = ext_kind.get(dot + ext.lower())
+            if kind == 0:
+                videos.append(Path(entry.path))
+            elif kind == 1:
+                index.setdefault(stem.casefold(), []).append(Path(entry.path))
+
+        def _walk(d, videos, index):
+            # os.scandir的目录项自带文件类型缓存，不用对每个文件额外stat
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_file(follow_symlinks=False):
+                            _classify(entry, videos, index)
+                        elif entry.is_dir(follow_symlinks=False):
+                            _walk(entry.path, videos, index)
+            except OSError:
+                pass
+
+        def _walk_subtree(d):
+            videos, index = [], {}
+            _walk(d, videos, index)
+            return videos, index
+
+        # 顶层单独扫一遍：文件直接分类，子目录收集起来决定是否并行下钻
+        top_dirs = []
+        try:
+            with os.scandir(str(directory)) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        _classify(entry, video_files, audio_index)
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        top_dirs.append(entry.path)
+        except OSError:
+            pass
+
+        if len(top_dirs) == 1:
+            _walk(top_dirs[0], video_files, audio_index)
+        elif top_dirs:
+            # 目录遍历是IO密集的：多个顶层子目录并行下钻，
+            # 在网络盘上每次目录列举都是毫秒级往返，重叠起来收益最大
+            with ThreadPoolExecutor(max_workers=min(8, len(top_dirs))) as executor:
+                for videos, index in executor.map(_walk_subtree, top_dirs):
+                    video_files.extend(videos)
+                    for stem, lst in index.items():
+                        audio_index.setdefault(stem, []).extend(lst)
+
+        return video_files, audio_index
         
     def similarity(self, a, b):
         """计算两个字符串的相似度"""
-        return SequenceMatcher(None, a, b).ratio()
+        # 相似度与顺序无关，排序后作为缓存键，(a,b)和(b,a)只占一个缓存项
+        if a > b:
+            a, b = b, a
+        return _sim(a, b)
         
     def match_files(self, video_files, audio_files, similarity_threshold=0.8):
         """
@@ -185,66 +381,174 @@ class VideoAudioMerger:
         
         Args:
             video_files: 视频文件列表
-            audio_files: 音频文件列表
+            audio_files: scan_directory返回的音频索引dict，也兼容普通文件列表
             similarity_threshold: 相似度阈值
-            
+
         Returns:
             list: 匹配的文件对列表 [(video_path, audio_path, match_type), ...]
         """
         matches = []
-        matched_audio = set()
-        
-        # 第一步：完全匹配
-        audio_dict = {}
-        for audio in audio_files:
-            stem = audio.stem
-            if stem not in audio_dict:
-                audio_dict[stem] = []
-            audio_dict[stem].append(audio)
-            
-        for video in video_files:
-            video_stem = video.stem
+        matched_audio = set()  # Path可哈希，直接入集合，省去每个路径一次str()分配
+        matched_videos = set()
+
+        # 第一步：完全匹配（大小写不敏感），索引在扫描阶段已建好
+        if isinstance(audio_files, dict):
+            audio_dict = audio_files
+        else:
+            # defaultdict每个音频只做一次哈希查找（setdefault要查两次）
+            audio_dict = defaultdict(list)
+            for audio in audio_files:
+                audio_dict[audio.stem.casefold()].append(audio)
+
+        # 主名每个文件只算一次（Path.stem每次访问都要rpartition），
+        # casefold后的结果在完全匹配和相似度两个阶段复用
+        video_stems = [(v, v.stem.casefold()) for v in video_files]
+
+        for video, video_stem in video_stems:
             if video_stem in audio_dict:
                 for audio in audio_dict[video_stem]:
-                    if str(audio) not in matched_audio:
+                    if audio not in matched_audio:
                         matches.append({
                             'video': video,
                             'audio': audio,
                             'match_type': 'exact',
                             'similarity': 1.0
                         })
-                        matched_audio.add(str(audio))
+                        matched_audio.add(audio)
+                        matched_videos.add(video)
                         break
-                        
+
         # 第二步：相似度匹配（对于未匹配的视频）
-        unmatched_videos = [v for v in video_files if not any(m['video'] == v for m in matches)]
-        unmatched_audios = [a for a in audio_files if str(a) not in matched_audio]
-        
-        for video in unmatched_videos:
-            video_stem = video.stem
-            best_match = None
-            best_score = 0
-            
-            for audio in unmatched_audios:
-                audio_stem = audio.stem
-                score = self.similarity(video_stem, audio_stem)
-                if score > best_score and score >= similarity_threshold:
-                    best_score = score
-                    best_match = audio
-                    
-            if best_match:
-                matches.append({
-                    'video': video,
-                    'audio': best_match,
-                    'match_type': 'similar',
-                    'similarity': best_score
-                })
-                unmatched_audios.remove(best_match)
-                
+        # 第一阶段已维护matched_videos集合，这里是O(N)的过滤，
+        # 不再对每个视频把matches整个扫一遍
+        unmatched_videos = [(v, stem) for v, stem in video_stems
+                            if v not in matched_videos]
+        unmatched_audios = [a for lst in audio_dict.values() for a in lst
+                            if a not in matched_audio]
+
+        if _rf_process is not None and unmatched_videos and unmatched_audios:
+            # 一次性算出整个相似度矩阵，避免Python层的双重循环。
+            # B站下载的文件名常带时间戳、清晰度标签或BV号后缀，位置还不固定，
+            # token_sort_ratio先分词排序再比较，对这类顺序漂移不敏感
+            scores = _rf_process.cdist(
+                [stem for _, stem in unmatched_videos],
+                [a.stem.casefold() for a in unmatched_audios],
+                scorer=_rf_fuzz.token_sort_ratio,
+                score_cutoff=similarity_threshold * 100,
+                workers=-1,
+            )
+            consumed = set()
+            for i, (video, _) in enumerate(unmatched_videos):
+                row = scores[i]
+                best_j = -1
+                best_score = 0
+                for j in range(len(unmatched_audios)):
+                    if j not in consumed and row[j] > best_score:
+                        best_score = row[j]
+                        best_j = j
+                if best_j >= 0 and best_score >= similarity_threshold * 100:
+                    matches.append({
+                        'video': video,
+                        'audio': unmatched_audios[best_j],
+                        'match_type': 'similar',
+                        'similarity': best_score / 100.0
+                    })
+                    consumed.add(best_j)
+        else:
+            audio_stems = [(a, a.stem.casefold(), len(a.stem)) for a in unmatched_audios]
+            consumed = set()
+
+            for video, video_stem in unmatched_videos:
+                vl = len(video_stem)
+                best_match = None
+                best_score = 0
+
+                for audio, audio_stem, al in audio_stems:
+                    if audio in consumed:
+                        continue
+                    # 长度差太大时相似度的上界达不到阈值，O(1)直接跳过
+                    if 2 * min(vl, al) < similarity_threshold * (vl + al):
+                        continue
+                    score = _sim_at_least(video_stem, audio_stem, similarity_threshold)
+                    if score > best_score and score >= similarity_threshold:
+                        best_score = score
+                        best_match = audio
+
+                if best_match:
+                    matches.append({
+                        'video': video,
+                        'audio': best_match,
+                        'match_type': 'similar',
+                        'similarity': best_score
+                    })
+                    consumed.add(best_match)
+
         self.matches = matches
         return matches
         
-    def merge_file(self, match_info, output_dir=None, output_suffix='_merged', 
+    def _output_path_for(self, match_info, output_dir=None, output_suffix='_merged'):
+        """计算一个匹配对的输出文件路径"""
+        video = match_info['video']
+        if output_dir:
+            return Path(output_dir) / f"{video.stem}{output_suffix}{video.suffix}"
+        return video.parent / f"{video.stem}{output_suffix}{video.suffix}"
+
+    def _build_merge_cmd(self, video, audio, output_path,
+                         video_codec='copy', audio_codec='aac', overwrite=False):
+        """构建合成单个文件对的FFmpeg命令"""
+        # 需要重编码视频时优先用硬件编码器（显卡ASIC比CPU软编快好几倍）；
+        # 默认的'copy'路径不受影响
+        if video_codec == 'auto':
+            video_codec = self._detect_hw_encoder() or 'libx264'
+        audio_codec = self._resolve_audio_codec(audio, audio_codec)
+
+        # -loglevel error + -nostats：不输出逐帧进度，stderr只剩真正的错误，
+        # 长视频合成时不会在内存里攒下几MB的进度文本
+        cmd = [
+            self.ffmpeg_path,
+            '-hide_banner', '-loglevel', 'error', '-nostats',
+            '-i', str(video),
+            '-i', str(audio),
+            '-c:v', video_codec,
+            '-c:a', audio_codec,
+            '-map', '0:v:0',  # 使用第一个输入的视频
+            '-map', '1:a:0',  # 使用第二个输入的音频
+            '-shortest',      # 以较短的为准
+            *self._mux_flags_for(output_path),
+        ]
+
+        # 重编码时限制FFmpeg线程数，和merge_all的并行度配合，避免CPU超订。
+        # -threads是位置相关的：必须放在输出选项组里才作用于编码器，
+        # 放在-i之前只会限制第一个输入的解码线程
+        if video_codec != 'copy':
+            cmd += ['-threads', '4']
+        cmd += ['-y' if overwrite else '-n', str(output_path)]
+        return cmd
+
+    @staticmethod
+    async def _run_ffmpeg(cmd):
+        """异步执行一条FFmpeg命令
+
+        不占用线程等待子进程：等待期间事件循环可以调度其他合成任务。
+        stdout直接丢弃，stderr收集用于报错。
+
+        Returns:
+            tuple: (returncode, stderr文本尾部)
+        """
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                **_LOW_PRIORITY_KWARGS
+            )
+            _, stderr = await proc.communicate()
+            error_text = stderr.decode('utf-8', errors='ignore')[-500:] if stderr else ''
+            return proc.returncode, error_text
+        except Exception as e:
+            return -1, str(e)
+
+    def merge_file(self, match_info, output_dir=None, output_suffix='_merged',
                    video_codec='copy', audio_codec='aac', overwrite=False):
         """
         合成单个视频和音频文件
@@ -262,40 +566,27 @@ class VideoAudioMerger:
         """
         video = match_info['video']
         audio = match_info['audio']
-        
+
         # 确定输出路径
-        if output_dir:
-            output_path = Path(output_dir) / f"{video.stem}{output_suffix}{video.suffix}"
-        else:
-            output_path = video.parent / f"{video.stem}{output_suffix}{video.suffix}"
-            
+        output_path = self._output_path_for(match_info, output_dir, output_suffix)
+
         # 检查输出文件
         if output_path.exists() and not overwrite:
             return False, f"输出文件已存在: {output_path}"
-            
-        # 构建FFmpeg命令
-        cmd = [
-            self.ffmpeg_path,
-            '-i', str(video),
-            '-i', str(audio),
-            '-c:v', video_codec,
-            '-c:a', audio_codec,
-            '-map', '0:v:0',  # 使用第一个输入的视频
-            '-map', '1:a:0',  # 使用第二个输入的音频
-            '-shortest',      # 以较短的为准
-            '-y' if overwrite else '-n',
-            str(output_path)
-        ]
-        
+
+        cmd = self._build_merge_cmd(video, audio, output_path,
+                                    video_codec, audio_codec, overwrite)
+
         try:
             result = subprocess.run(
                 cmd,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
-                errors='ignore'
+                errors='ignore',
+                **_LOW_PRIORITY_KWARGS
             )
-            
+
             if result.returncode == 0:
                 return True, str(output_path)
             else:
@@ -305,66 +596,135 @@ class VideoAudioMerger:
         except Exception as e:
             return False, f"执行失败: {e}"
             
-    def merge_all(self, output_dir=None, output_suffix='_merged', 
-                  video_codec='copy', audio_codec='aac', 
-                  overwrite=False, max_workers=2):
+    async def _merge_batch(self, batch, semaphore, output_dir=None,
+                           output_suffix='_merged', video_codec='copy',
+                           audio_codec='aac', overwrite=False):
+        """
+        用一条FFmpeg命令合成一批文件对（异步）
+
+        每个FFmpeg进程启动都有上百毫秒的初始化开销（解析参数、注册编解码器、
+        探测输入），多对输入共用一个进程可以把这个开销摊薄。
+        批量失败时退回逐个合成，以拿到每个文件各自的错误信息。
+        并行度由semaphore控制。
+
+        Returns:
+            list: [(match_info, success, message), ...]
+        """
+        if video_codec == 'auto':
+            video_codec = self._detect_hw_encoder() or 'libx264'
+
+        results = []
+        runnable = []
+        for match in batch:
+            output_path = self._output_path_for(match, output_dir, output_suffix)
+            if output_path.exists() and not overwrite:
+                results.append((match, False, f"输出文件已存在: {output_path}"))
+            else:
+                runnable.append((match, output_path))
+
+        if not runnable:
+            return results
+
+        async with semaphore:
+            if len(runnable) > 1:
+                cmd = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error',
+                       '-nostats', '-y' if overwrite else '-n']
+                for match, _ in runnable:
+                    cmd.extend(['-i', str(match['video']), '-i', str(match['audio'])])
+                for idx, (match, output_path) in enumerate(runnable):
+                    cmd.extend([
+                        '-map', f'{2 * idx}:v:0',
+                        '-map', f'{2 * idx + 1}:a:0',
+                        '-c:v', video_codec,
+                        '-c:a', self._resolve_audio_codec(match['audio'], audio_codec),
+                        '-shortest',
+                        *self._mux_flags_for(output_path),
+                        str(output_path)
+                    ])
+
+                returncode, _ = await self._run_ffmpeg(cmd)
+                if returncode == 0:
+                    results.extend((match, True, str(path)) for match, path in runnable)
+                    return results
+
+                # 批量中途失败时可能已经写出部分输出：这些文件在批次开始前
+                # 验证过不存在，肯定是这次失败留下的半成品，先清掉——否则
+                # 逐对重试带-n会全部撞"已存在"报错，坏文件还冒充合成结果
+                for _, output_path in runnable:
+                    try:
+                        output_path.unlink(missing_ok=True)
+                    except OSError:
+                        pass
+
+            # 单对批次，或批量失败：逐个合成，定位出错的文件
+            for match, output_path in runnable:
+                cmd = self._build_merge_cmd(
+                    match['video'], match['audio'], output_path,
+                    video_codec, audio_codec, overwrite)
+                returncode, error_text = await self._run_ffmpeg(cmd)
+                if returncode == 0:
+                    results.append((match, True, str(output_path)))
+                else:
+                    results.append(
+                        (match, False, f"FFmpeg错误: {error_text or '未知错误'}"))
+        return results
+
+    def merge_all(self, output_dir=None, output_suffix='_merged',
+                  video_codec='copy', audio_codec='aac',
+                  overwrite=False, max_workers=None, batch_size=8):
         """
         合成所有匹配的文件对
-        
+
         Args:
             output_dir: 输出目录
             output_suffix: 输出文件名后缀
             video_codec: 视频编码
             audio_codec: 音频编码
             overwrite: 是否覆盖
-            max_workers: 最大并行数
-            
+            max_workers: 最大并行数，None时按CPU核数自动选择
+            batch_size: 每条FFmpeg命令处理的文件对数
+
         Returns:
             list: 结果列表 [(success, message), ...]
         """
         if not self.matches:
             return []
-            
+
+        if max_workers is None:
+            cpu = os.cpu_count() or 2
+            # 流复制是IO密集的，并行数可以开到核数；
+            # 重编码吃CPU，每个FFmpeg自己开4线程，进程数相应除以4
+            max_workers = cpu if video_codec == 'copy' else max(1, cpu // 4)
+
         results = []
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_match = {
-                executor.submit(
-                    self.merge_file, 
-                    match, 
-                    output_dir, 
-                    output_suffix,
-                    video_codec,
-                    audio_codec,
-                    overwrite
-                ): match for match in self.matches
-            }
-            
-            for future in as_completed(future_to_match):
-                match = future_to_match[future]
-                try:
-                    success, message = future.result()
+        batches = [self.matches[i:i + batch_size]
+                   for i in range(0, len(self.matches), batch_size)]
+
+        # 用asyncio驱动子进程：等待FFmpeg期间不占用线程，
+        # 并行度由信号量控制，几百个任务也只是事件循环里的协程
+        async def _run_batches():
+            semaphore = asyncio.Semaphore(max_workers)
+            tasks = [
+                self._merge_batch(
+                    batch, semaphore, output_dir, output_suffix,
+                    video_codec, audio_codec, overwrite
+                ) for batch in batches
+            ]
+            for task in asyncio.as_completed(tasks):
+                for match, success, message in await task:
                     results.append({
                         'video': match['video'],
                         'audio': match['audio'],
                         'success': success,
                         'message': message
                     })
-                    
+
                     status = "✓" if success else "✗"
                     print(f"{status} {match['video'].name} + {match['audio'].name}")
                     if not success:
                         print(f"  错误: {message}")
-                        
-                except Exception as e:
-                    results.append({
-                        'video': match['video'],
-                        'audio': match['audio'],
-                        'success': False,
-                        'message': str(e)
-                    })
-                    print(f"✗ {match['video'].name}: {e}")
-                    
+
+        asyncio.run(_run_batches())
         return results
         
     def get_statistics(self):
@@ -441,17 +801,18 @@ def interactive_mode():
         
     # 扫描文件
     print(f"\n正在扫描目录: {directory}")
-    video_files, audio_files = merger.scan_directory(directory)
-    
-    print(f"找到 {len(video_files)} 个视频文件, {len(audio_files)} 个音频文件")
-    
-    if not video_files or not audio_files:
+    video_files, audio_index = merger.scan_directory(directory)
+    audio_count = sum(len(lst) for lst in audio_index.values())
+
+    print(f"找到 {len(video_files)} 个视频文件, {audio_count} 个音频文件")
+
+    if not video_files or not audio_index:
         print("需要同时存在视频和音频文件才能进行匹配")
         return
         
     # 匹配文件
     print("\n正在匹配文件...")
-    matches = merger.match_files(video_files, audio_files)
+    matches = merger.match_files(video_files, audio_index)
     
     if not matches:
         print("未找到匹配的文件对")
@@ -493,8 +854,7 @@ def interactive_mode():
     results = merger.merge_all(
         output_dir=output_dir,
         output_suffix=output_suffix,
-        overwrite=False,
-        max_workers=2
+        overwrite=False
     )
     
     # 统计结果
@@ -518,8 +878,8 @@ def quick_merge(directory, ffmpeg_path=None, output_dir=None, suffix='_merged'):
         print(f"FFmpeg错误: {msg}")
         return False
         
-    video_files, audio_files = merger.scan_directory(directory)
-    matches = merger.match_files(video_files, audio_files)
+    video_files, audio_index = merger.scan_directory(directory)
+    matches = merger.match_files(video_files, audio_index)
     
     if not matches:
         print("未找到匹配的文件")
@@ -529,8 +889,7 @@ def quick_merge(directory, ffmpeg_path=None, output_dir=None, suffix='_merged'):
     results = merger.merge_all(
         output_dir=output_dir,
         output_suffix=suffix,
-        overwrite=False,
-        max_workers=2
+        overwrite=False
     )
     
     success_count = sum(1 for r in results if r['success'])
@@ -8,8 +8,10 @@
 import os
 import sys
 import json
+import queue
 import subprocess
 import threading
+from collections import deque
 from pathlib import Path
 from difflib import SequenceMatcher
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -22,12 +24,25 @@ except ImportError:
     print("请确保Python安装了tkinter支持")
     sys.exit(1)
 
+# 可选加速：装了rapidfuzz时相似度矩阵用C++位并行算法一次算完，
+# 比difflib的纯Python实现快约两个数量级；没装则退回difflib。
+# cdist返回矩阵要numpy，而numpy不是rapidfuzz的声明依赖，
+# 必须一并探测，否则匹配跑到cdist才抛ModuleNotFoundError
+try:
+    import numpy as _np
+    from rapidfuzz import fuzz as _rf_fuzz
+    from rapidfuzz import process as _rf_process
+except ImportError:
+    _np = None
+    _rf_fuzz = None
+    _rf_process = None
+
 
 class VideoAudioMergerGUI:
     """视频音频合成工具的GUI版本"""
     
-    VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
-    AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
+    VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'})
+    AUDIO_EXTENSIONS = frozenset({'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'})
     
     def __init__(self, root):
         self.root = root
@@ -41,15 +56,37 @@ class VideoAudioMergerGUI:
         self.output_dir = tk.StringVar()
         self.output_suffix = tk.StringVar(value='_merged')
         self.similarity_threshold = tk.DoubleVar(value=0.8)
-        self.max_workers = tk.IntVar(value=2)
+        # 并行数按机器核数取默认值；流复制合成是IO密集的，
+        # 上限放开到核数，不再固定卡在4
+        self._cpu_count = os.cpu_count() or 4
+        self.max_workers = tk.IntVar(value=max(2, self._cpu_count // 2))
         self.overwrite = tk.BooleanVar(value=False)
         
         self.matches = []
         self.is_running = False
-        
+        self.is_scanning = False
+
+        # 日志缓冲：积攒100ms内的日志一次性插入，
+        # 避免每条日志都触发一次文本控件的重排和滚动
+        self._log_buf = deque()
+        self._log_pending = False
+
+        # 正在运行的FFmpeg进程句柄，停止时直接terminate而不是等跑完
+        self._live_procs = set()
+        self._live_procs_lock = threading.Lock()
+
+        # FFmpeg验证缓存：验证过的(mtime, size)指纹，二进制没变就不再起子进程
+        self._ffmpeg_verified = None
+        self._ffmpeg_fingerprint = None
+        self._ffmpeg_version = None
+
         # 加载配置
         self.config_file = Path.home() / '.video_audio_merger.json'
         self.load_config()
+
+        # 扫描结果缓存：目录树没动过时重复点"扫描文件"不再遍历文件系统
+        self._scan_cache_file = Path.home() / '.video_audio_merger_scan_cache.json'
+        self._scan_cache = self._load_scan_cache()
         
         # 创建界面
         self.create_widgets()
@@ -65,15 +102,28 @@ class VideoAudioMergerGUI:
                     config = json.load(f)
                     if config.get('ffmpeg_path'):
                         self.ffmpeg_path.set(config['ffmpeg_path'])
+                    fp = config.get('ffmpeg_fingerprint')
+                    if fp:
+                        self._ffmpeg_fingerprint = tuple(fp)
+                        self._ffmpeg_version = config.get('ffmpeg_version')
             except:
                 pass
-                
+
+    @staticmethod
+    def _atomic_write_json(path, obj):
+        """先写临时文件再os.replace：写到一半崩溃也不会留下损坏的JSON"""
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8'))
+        os.replace(tmp, path)
+
     def save_config(self):
         """保存配置"""
         config = {'ffmpeg_path': self.ffmpeg_path.get()}
+        if self._ffmpeg_fingerprint:
+            config['ffmpeg_fingerprint'] = list(self._ffmpeg_fingerprint)
+            config['ffmpeg_version'] = self._ffmpeg_version
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            self._atomic_write_json(self.config_file, config)
         except:
             pass
             
@@ -136,7 +186,7 @@ class VideoAudioMergerGUI:
                    textvariable=self.similarity_threshold, width=8).grid(row=0, column=3, sticky=tk.W, padx=5)
         
         ttk.Label(options_frame, text="并行任务:").grid(row=0, column=4, sticky=tk.W, padx=(20, 0))
-        ttk.Spinbox(options_frame, from_=1, to=4, increment=1, 
+        ttk.Spinbox(options_frame, from_=1, to=self._cpu_count, increment=1,
                    textvariable=self.max_workers, width=8).grid(row=0, column=5, sticky=tk.W, padx=5)
         
         ttk.Checkbutton(options_frame, text="覆盖已存在文件", 
@@ -209,12 +259,33 @@ class VideoAudioMergerGUI:
             self.output_dir.set(path)
             
     def verify_ffmpeg(self):
-        """验证FFmpeg"""
+        """验证FFmpeg
+
+        子进程验证的结果按二进制文件的(mtime, size)指纹缓存：
+        指纹没变就不再为每次点击起一个ffmpeg -version进程。
+        """
         path = self.ffmpeg_path.get()
         if not path or not Path(path).exists():
             self.ffmpeg_status.config(text="FFmpeg 路径无效", foreground="red")
+            self._ffmpeg_verified = None
             return False
-            
+
+        try:
+            st = Path(path).stat()
+            fingerprint = (path, st.st_mtime, st.st_size)
+        except OSError:
+            fingerprint = None
+
+        # 本次会话已验证过，或上次会话验证过同一个二进制
+        if fingerprint:
+            if self._ffmpeg_verified == fingerprint:
+                return True
+            if self._ffmpeg_fingerprint == fingerprint and self._ffmpeg_version:
+                self.ffmpeg_status.config(
+                    text=f"✓ {self._ffmpeg_version[:60]}...", foreground="green")
+                self._ffmpeg_verified = fingerprint
+                return True
+
         try:
             result = subprocess.run(
                 [path, '-version'],
@@ -225,128 +296,305 @@ class VideoAudioMergerGUI:
             if result.returncode == 0:
                 version = result.stdout.split('\n')[0]
                 self.ffmpeg_status.config(text=f"✓ {version[:60]}...", foreground="green")
+                self._ffmpeg_verified = fingerprint
+                self._ffmpeg_fingerprint = fingerprint
+                self._ffmpeg_version = version
                 self.save_config()
                 return True
             else:
                 self.ffmpeg_status.config(text="FFmpeg 无法正常运行", foreground="red")
+                self._ffmpeg_verified = None
                 return False
         except Exception as e:
             self.ffmpeg_status.config(text=f"验证失败: {e}", foreground="red")
+            self._ffmpeg_verified = None
             return False
             
     def log(self, message):
-        """添加日志"""
-        self.log_text.insert(tk.END, message + '\n')
+        """添加日志（缓冲后批量刷新）"""
+        self._log_buf.append(message + '\n')
+        if not self._log_pending:
+            self._log_pending = True
+            self.root.after(100, self._flush_log)
+
+    def _flush_log(self):
+        """把缓冲的日志一次性插入文本控件"""
+        self._log_pending = False
+        if not self._log_buf:
+            return
+        batch = ''.join(self._log_buf)
+        self._log_buf.clear()
+        self.log_text.insert(tk.END, batch)
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
         
     def scan_files(self):
-        """扫描文件"""
+        """扫描文件（遍历和匹配放到工作线程，界面不冻结）"""
+        if self.is_scanning:
+            return
+
         directory = self.source_dir.get()
         if not directory:
             messagebox.showwarning("警告", "请先选择源目录")
             return
-            
+
         if not Path(directory).exists():
             messagebox.showerror("错误", "源目录不存在")
             return
-            
+
+        # Tk变量在主线程读好，工作线程只拿普通Python值
+        threshold = self.similarity_threshold.get()
+
+        self.is_scanning = True
+        self.scan_btn.config(state=tk.DISABLED)
         self.log(f"正在扫描目录: {directory}")
         self.status_label.config(text="正在扫描...")
-        self.root.update()
-        
-        # 扫描文件
-        video_files = []
-        audio_files = []
-        
-        for file_path in Path(directory).rglob('*'):
-            if file_path.is_file():
-                ext = file_path.suffix.lower()
-                if ext in self.VIDEO_EXTENSIONS:
-                    video_files.append(file_path)
-                elif ext in self.AUDIO_EXTENSIONS:
-                    audio_files.append(file_path)
-                    
+
+        threading.Thread(target=self._scan_worker,
+                         args=(directory, threshold), daemon=True).start()
+
+    def _scan_worker(self, directory, threshold):
+        """工作线程：遍历+匹配；Tk不是线程安全的，界面更新回投主线程"""
+        # 目录树没动过时直接复用上次结果
+        cached = self._cached_scan(directory)
+        if cached is not None:
+            video_files, audio_files = cached
+            self.root.after(0, self.log, "目录未变化，使用上次扫描结果")
+        else:
+            video_files, audio_files, dir_stamps = self._scan_tree(directory)
+            self._scan_cache[directory] = {
+                'dirs': [list(t) for t in dir_stamps],
+                'videos': [str(p) for p in video_files],
+                'audios': [str(p) for p in audio_files],
+            }
+            self._save_scan_cache()
+
+        if video_files and audio_files:
+            matches = self.match_files(video_files, audio_files, threshold)
+        else:
+            matches = []
+
+        self.root.after(0, self._scan_done, video_files, audio_files, matches)
+
+    def _scan_done(self, video_files, audio_files, matches):
+        """主线程：应用扫描结果并更新界面"""
+        self.is_scanning = False
+        self.scan_btn.config(state=tk.NORMAL)
+
         self.log(f"找到 {len(video_files)} 个视频文件, {len(audio_files)} 个音频文件")
-        
+
         if not video_files or not audio_files:
             messagebox.showinfo("提示", "需要同时存在视频和音频文件才能进行匹配")
             self.status_label.config(text="扫描完成 - 未找到足够的文件")
             return
-            
-        # 匹配文件
-        self.matches = self.match_files(video_files, audio_files)
-        
+
+        self.matches = matches
+
         if not self.matches:
             self.log("未找到匹配的文件对")
             messagebox.showinfo("提示", "未找到匹配的文件对")
             self.status_label.config(text="扫描完成 - 未找到匹配")
             return
-            
+
         exact_count = sum(1 for m in self.matches if m['match_type'] == 'exact')
         similar_count = len(self.matches) - exact_count
-        
+
         self.log(f"\n匹配结果:")
         self.log(f"  完全匹配: {exact_count}")
         self.log(f"  相似匹配: {similar_count}")
         self.log(f"  总计: {len(self.matches)}")
-        
+
         self.preview_btn.config(state=tk.NORMAL)
         self.merge_btn.config(state=tk.NORMAL)
         self.status_label.config(text=f"找到 {len(self.matches)} 对匹配文件")
         
-    def match_files(self, video_files, audio_files):
+    def _scan_tree(self, directory):
+        """迭代遍历目录树，返回(视频列表, 音频列表, 目录mtime指纹)"""
+        video_files = []
+        audio_files = []
+        dir_stamps = []
+        stack = [str(directory)]
+        while stack:
+            d = stack.pop()
+            try:
+                dir_stamps.append((d, os.stat(d).st_mtime_ns))
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            name = entry.name
+                            dot = name.rfind('.')
+                            if dot < 0:
+                                continue
+                            ext = name[dot:].lower()
+                            if ext in self.VIDEO_EXTENSIONS:
+                                video_files.append(Path(entry.path))
+                            elif ext in self.AUDIO_EXTENSIONS:
+                                audio_files.append(Path(entry.path))
+            except OSError:
+                continue
+        return video_files, audio_files, dir_stamps
+
+    def _load_scan_cache(self):
+        """读取持久化的扫描缓存，损坏或不存在时返回空"""
+        try:
+            with open(self._scan_cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_scan_cache(self):
+        """持久化扫描缓存（尽力而为，失败不影响功能）"""
+        try:
+            self._atomic_write_json(self._scan_cache_file, self._scan_cache)
+        except Exception:
+            pass
+
+    def _cached_scan(self, directory):
+        """缓存有效（所有目录的mtime都没变）时返回上次的扫描结果"""
+        entry = self._scan_cache.get(directory)
+        if not entry:
+            return None
+        try:
+            for d, mtime_ns in entry['dirs']:
+                if os.stat(d).st_mtime_ns != mtime_ns:
+                    return None
+        except (OSError, KeyError, TypeError, ValueError):
+            return None
+        return ([Path(p) for p in entry['videos']],
+                [Path(p) for p in entry['audios']])
+
+    def match_files(self, video_files, audio_files, threshold=None):
         """匹配文件"""
-        threshold = self.similarity_threshold.get()
+        if threshold is None:
+            threshold = self.similarity_threshold.get()
         matches = []
+
+        # 主名每个文件只算一次（Path.stem每次访问都要重新切分字符串），
+        # 后续各阶段都走平行列表按下标取，不再反复访问Path属性
+        video_stems = [v.stem for v in video_files]
+        audio_stems = [a.stem for a in audio_files]
+
         matched_audio = set()
-        
-        # 完全匹配
-        audio_dict = {}
-        for audio in audio_files:
-            stem = audio.stem
-            if stem not in audio_dict:
-                audio_dict[stem] = []
-            audio_dict[stem].append(audio)
-            
-        for video in video_files:
-            video_stem = video.stem
-            if video_stem in audio_dict:
-                for audio in audio_dict[video_stem]:
-                    if str(audio) not in matched_audio:
-                        matches.append({
-                            'video': video,
-                            'audio': audio,
-                            'match_type': 'exact',
-                            'similarity': 1.0
-                        })
-                        matched_audio.add(str(audio))
+        matched_videos = set()
+
+        # 完全匹配：绝大多数主名只对应一个音频，常见情形不为每个键建列表，
+        # 只有撞名的主名才进dupes里的列表
+        audio_by_stem = {}
+        dupes = {}
+        for ai, stem in enumerate(audio_stems):
+            prev = audio_by_stem.setdefault(stem, ai)
+            if prev != ai:
+                dupes.setdefault(stem, [prev]).append(ai)
+
+        for vi, video_stem in enumerate(video_stems):
+            ai = audio_by_stem.get(video_stem)
+            if ai is None:
+                continue
+            if ai in matched_audio:
+                # 罕见分支：同名音频有多个，找还没用掉的那个
+                for cand in dupes.get(video_stem, ()):
+                    if cand not in matched_audio:
+                        ai = cand
                         break
-                        
-        # 相似匹配
-        unmatched_videos = [v for v in video_files if not any(m['video'] == v for m in matches)]
-        unmatched_audios = [a for a in audio_files if str(a) not in matched_audio]
-        
-        for video in unmatched_videos:
-            video_stem = video.stem
-            best_match = None
-            best_score = 0
-            
-            for audio in unmatched_audios:
-                score = SequenceMatcher(None, video_stem, audio.stem).ratio()
-                if score > best_score and score >= threshold:
-                    best_score = score
-                    best_match = audio
-                    
-            if best_match:
+                else:
+                    continue
+            matches.append({
+                'video': video_files[vi],
+                'audio': audio_files[ai],
+                'match_type': 'exact',
+                'similarity': 1.0
+            })
+            matched_audio.add(ai)
+            matched_videos.add(vi)
+
+        # 相似匹配（集合过滤是O(N)，不再对每个视频把matches整个扫一遍）
+        unmatched_videos = [(video_files[i], video_stems[i])
+                            for i in range(len(video_files))
+                            if i not in matched_videos]
+        unmatched_audios = [(audio_files[i], audio_stems[i])
+                            for i in range(len(audio_files))
+                            if i not in matched_audio]
+
+        if _rf_process is not None and unmatched_videos and unmatched_audios:
+            # 一次性算出整个相似度矩阵，避免Python层的双重循环
+            scores = _rf_process.cdist(
+                [stem for _, stem in unmatched_videos],
+                [stem for _, stem in unmatched_audios],
+                scorer=_rf_fuzz.ratio,
+                score_cutoff=threshold * 100,
+                workers=-1,
+            )
+            candidates = []
+            for i in range(len(unmatched_videos)):
+                row = scores[i]
+                for j in range(len(unmatched_audios)):
+                    if row[j] >= threshold * 100:
+                        candidates.append((row[j], i, j))
+            # 全局贪心：候选对按分数从高到低接受，两端都空闲才配对；
+            # 按视频顺序先到先得会过早锁死次优配对
+            candidates.sort(key=lambda t: t[0], reverse=True)
+            used_videos = set()
+            used_audios = set()
+            for score, i, j in candidates:
+                if i in used_videos or j in used_audios:
+                    continue
                 matches.append({
-                    'video': video,
-                    'audio': best_match,
+                    'video': unmatched_videos[i][0],
+                    'audio': unmatched_audios[j][0],
                     'match_type': 'similar',
-                    'similarity': best_score
+                    'similarity': score / 100.0
                 })
-                unmatched_audios.remove(best_match)
-                
+                used_videos.add(i)
+                used_audios.add(j)
+            return matches
+
+        # autojunk=False：默认的autojunk会把重复字符当junk，
+        # 对带集数编号的B站文件名会算出错误的相似度
+        sm = SequenceMatcher(autojunk=False)
+
+        # 候选筛选只靠长度门和difflib的两级快速上界。三元组倒排索引
+        # 在这里不成立：一次内部插删最多毁掉3个三元组，阈值0.8允许的
+        # 编辑量足以把共享数压到0，任何有过滤力的共享数门槛都会漏掉
+        # 明明过阈值的配对（内部序号/画质差异正是要抓的情形）
+        scored_pairs = []
+
+        for video, video_stem in unmatched_videos:
+            vl = len(video_stem)
+
+            # set_seq2让difflib缓存video_stem的字符索引，整个内层循环复用
+            sm.set_seq2(video_stem)
+            for audio, audio_stem in unmatched_audios:
+                # 相似度上界是2*min(la,lb)/(la+lb)，达不到阈值的直接跳过
+                # （乘法形式没有除法的浮点误差，边界长度不会被误杀）
+                al = len(audio_stem)
+                if 2 * min(vl, al) < threshold * (vl + al):
+                    continue
+                sm.set_seq1(audio_stem)
+                # 先用difflib的两级快速上界排除明显不匹配的
+                if sm.real_quick_ratio() < threshold or sm.quick_ratio() < threshold:
+                    continue
+                score = sm.ratio()
+                if score >= threshold:
+                    scored_pairs.append((score, video, audio))
+
+        # 全局贪心：候选对按分数从高到低接受，两端都空闲才配对；
+        # 按视频顺序先到先得会过早锁死次优配对
+        scored_pairs.sort(key=lambda t: t[0], reverse=True)
+        used_videos = set()
+        used_audios = set()
+        for score, video, audio in scored_pairs:
+            if video in used_videos or audio in used_audios:
+                continue
+            matches.append({
+                'video': video,
+                'audio': audio,
+                'match_type': 'similar',
+                'similarity': score
+            })
+            used_videos.add(video)
+            used_audios.add(audio)
+
         return matches
         
     def preview_matches(self):
@@ -381,17 +629,27 @@ class VideoAudioMergerGUI:
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 填充数据
-        for i, match in enumerate(self.matches, 1):
-            match_type = "完全匹配" if match['match_type'] == 'exact' else "相似匹配"
-            similarity = f"{match['similarity']:.0%}" if match['match_type'] == 'similar' else "100%"
-            tree.insert('', tk.END, values=(
-                i,
-                match_type,
-                match['video'].name,
-                match['audio'].name,
-                similarity
-            ))
+        # 分批填充：每次只插500行，剩下的排到下一轮事件循环，
+        # 几千条匹配时预览窗口立即可见、可滚动，不会冻住
+        matches = self.matches
+
+        def _insert_chunk(start):
+            end = min(start + 500, len(matches))
+            for i in range(start, end):
+                match = matches[i]
+                match_type = "完全匹配" if match['match_type'] == 'exact' else "相似匹配"
+                similarity = f"{match['similarity']:.0%}" if match['match_type'] == 'similar' else "100%"
+                tree.insert('', tk.END, values=(
+                    i + 1,
+                    match_type,
+                    match['video'].name,
+                    match['audio'].name,
+                    similarity
+                ))
+            if end < len(matches) and preview_window.winfo_exists():
+                preview_window.after(0, _insert_chunk, end)
+
+        _insert_chunk(0)
             
     def start_merge(self):
         """开始合成"""
@@ -408,122 +666,214 @@ class VideoAudioMergerGUI:
         self.preview_btn.config(state=tk.DISABLED)
         self.merge_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
-        
-        # 在新线程中运行合成
-        thread = threading.Thread(target=self.merge_all)
+
+        total = len(self.matches)
+        self._merge_total = total
+        self._merge_success = 0
+        self._result_queue = queue.Queue()
+        self.progress['maximum'] = total
+        self.progress['value'] = 0
+
+        # Tk变量在主线程一次性读好（Tcl桥不是线程安全的），
+        # 工作线程只拿普通Python值
+        ffmpeg = self.ffmpeg_path.get()
+        output_dir = self.output_dir.get() or None
+        suffix = self.output_suffix.get()
+        overwrite = self.overwrite.get()
+        max_workers = self.max_workers.get()
+
+        # 在新线程中运行合成；主线程定时从队列批量取结果刷新界面，
+        # 工作线程完全不碰Tk
+        thread = threading.Thread(
+            target=self.merge_all,
+            args=(ffmpeg, output_dir, suffix, overwrite, max_workers))
         thread.daemon = True
         thread.start()
+        self.root.after(150, self._drain_queue)
         
     def stop_merge(self):
-        """停止合成"""
+        """停止合成：终止正在运行的FFmpeg进程，而不是等它们自然结束"""
         self.is_running = False
         self.log("正在停止...")
+        with self._live_procs_lock:
+            procs = list(self._live_procs)
+        for p in procs:
+            try:
+                p.terminate()
+            except OSError:
+                pass
         
-    def merge_all(self):
-        """合成所有文件"""
-        output_dir = self.output_dir.get() or None
-        suffix = self.output_suffix.get()
-        overwrite = self.overwrite.get()
-        max_workers = self.max_workers.get()
-        
+    def merge_all(self, ffmpeg, output_dir, suffix, overwrite, max_workers):
+        """合成所有文件（工作线程：只干活，结果经队列交给主线程）"""
         total = len(self.matches)
-        success_count = 0
-        
-        self.progress['maximum'] = total
-        self.progress['value'] = 0
-        
-        self.log(f"\n开始合成 {total} 个文件...")
-        self.log("="*60)
-        
+        self._result_queue.put(('log', f"\n开始合成 {total} 个文件..."))
+        self._result_queue.put(('log', "=" * 60))
+
+        # 每个FFmpeg默认会开满核数的线程，并行N个进程就是N倍超订；
+        # 按并行度摊分，总线程数大致等于核数
+        threads = max(1, (os.cpu_count() or 4) // max(1, max_workers))
+
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_match = {}
-            
+
             for match in self.matches:
                 if not self.is_running:
                     break
-                    
+
                 future = executor.submit(
                     self.merge_single,
                     match,
+                    ffmpeg,
                     output_dir,
                     suffix,
-                    overwrite
+                    overwrite,
+                    threads
                 )
                 future_to_match[future] = match
-                
+
             for future in as_completed(future_to_match):
                 if not self.is_running:
                     executor.shutdown(wait=False)
                     break
-                    
+
                 match = future_to_match[future]
                 try:
                     success, message = future.result()
-                    if success:
-                        success_count += 1
-                        self.log(f"✓ {match['video'].name}")
-                    else:
-                        self.log(f"✗ {match['video'].name}: {message}")
                 except Exception as e:
-                    self.log(f"✗ {match['video'].name}: {e}")
-                    
-                self.progress['value'] += 1
-                self.status_label.config(text=f"进度: {self.progress['value']}/{total}")
-                self.root.update_idletasks()
-                
+                    success, message = False, str(e)
+                self._result_queue.put(('result', success, match, message))
+
+        self._result_queue.put(('done',))
+
+    def _drain_queue(self):
+        """主线程：定时批量取走工作线程的结果，一次性刷新界面"""
+        finished = False
+        lines = []
+        completed = 0
+
+        while True:
+            try:
+                item = self._result_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = item[0]
+            if kind == 'log':
+                lines.append(item[1])
+            elif kind == 'result':
+                _, success, match, message = item
+                completed += 1
+                if success:
+                    self._merge_success += 1
+                    lines.append(f"✓ {match['video'].name}")
+                else:
+                    lines.append(f"✗ {match['video'].name}: {message}")
+            else:
+                finished = True
+
+        for line in lines:
+            self.log(line)
+        if completed:
+            self.progress['value'] += completed
+            self.status_label.config(
+                text=f"进度: {int(self.progress['value'])}/{self._merge_total}")
+
+        if finished:
+            self._finish_merge()
+        else:
+            self.root.after(150, self._drain_queue)
+
+    def _finish_merge(self):
+        """主线程：合成结束，恢复界面状态"""
+        total = self._merge_total
+        success_count = self._merge_success
+
         self.log("="*60)
         self.log(f"合成完成: {success_count}/{total} 成功")
-        
+
         self.is_running = False
         self.scan_btn.config(state=tk.NORMAL)
         self.preview_btn.config(state=tk.NORMAL)
         self.merge_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_label.config(text=f"完成: {success_count}/{total} 成功")
-        
+
         messagebox.showinfo("完成", f"合成完成!\n成功: {success_count}\n失败: {total - success_count}")
         
-    def merge_single(self, match, output_dir, suffix, overwrite):
+    @staticmethod
+    def _audio_compat(audio_path, video_ext):
+        """源音频与输出容器兼容时返回'copy'，省掉整个音频解码+重编码
+
+        B站下载的.m4a就是AAC in MP4，流复制后合成退化成纯封装，
+        每个文件从几十秒的重编码变成亚秒级的复制。
+        """
+        ext = audio_path.suffix.lower()
+        if video_ext in {'.mp4', '.m4v', '.mov'} and ext in {'.m4a', '.aac'}:
+            return 'copy'
+        if video_ext == '.mkv':
+            # Matroska几乎什么音频流都能装
+            return 'copy'
+        return 'aac'
+
+    def merge_single(self, match, ffmpeg, output_dir, suffix, overwrite, threads=0):
         """合成单个文件"""
         video = match['video']
         audio = match['audio']
-        
+
         if output_dir:
             output_path = Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
         else:
             output_path = video.parent / f"{video.stem}{suffix}{video.suffix}"
-            
+
         if output_path.exists() and not overwrite:
             return False, "文件已存在"
-            
+
+        # -loglevel error：不输出逐帧进度，stderr只剩真正的错误；
+        # -nostdin：防止ffmpeg在后台等待键盘输入；
+        # -threads放输出选项组里（位置相关，放-i之前只限制解码线程）
         cmd = [
-            self.ffmpeg_path.get(),
+            ffmpeg,
+            '-hide_banner', '-loglevel', 'error', '-nostdin',
             '-i', str(video),
             '-i', str(audio),
             '-c:v', 'copy',
-            '-c:a', 'aac',
+            '-c:a', self._audio_compat(audio, video.suffix.lower()),
             '-map', '0:v:0',
             '-map', '1:a:0',
+            *(('-threads', str(threads)) if threads else ()),
             '-shortest',
             '-y' if overwrite else '-n',
             str(output_path)
         ]
         
+        proc = None
         try:
-            result = subprocess.run(
+            # 正常输出在内核层直接丢弃，不再把几KB的进度文本读进父进程；
+            # 用Popen并登记句柄，停止按钮能立即terminate在跑的进程
+            proc = subprocess.Popen(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
                 encoding='utf-8',
-                errors='ignore',
-                timeout=300
+                errors='ignore'
             )
-            
-            if result.returncode == 0:
+            with self._live_procs_lock:
+                self._live_procs.add(proc)
+            try:
+                _, stderr = proc.communicate(timeout=300)
+            finally:
+                with self._live_procs_lock:
+                    self._live_procs.discard(proc)
+
+            if proc.returncode == 0:
                 return True, str(output_path)
             else:
-                error = result.stderr[-200:] if result.stderr else "未知错误"
+                error = stderr[-200:] if stderr else "未知错误"
                 return False, error
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return False, "FFmpeg执行超时"
         except Exception as e:
             return False, str(e)
 
@@ -55,8 +55,13 @@ try:
     log_info("检查其他模块...")
     import os
     import json
+    import math
+    import queue
+    import shutil
     import subprocess
     import threading
+    import unicodedata
+    from collections import defaultdict
     from pathlib import Path
     from difflib import SequenceMatcher
     from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -66,6 +71,14 @@ except Exception as e:
     log_error(f"模块加载失败: {e}")
     raise
 
+# C加速的SequenceMatcher（可选）：cydifflib是difflib的直接替代，
+# 算法一致，常数因子快几倍
+try:
+    from cydifflib import SequenceMatcher
+    log_info("使用cydifflib加速相似度计算")
+except ImportError:
+    pass
+
 # 导入主程序
 log_info("加载主程序...")
 try:
@@ -104,13 +117,47 @@ def setup_high_dpi():
         return 1.0
 
 
+# ========== 目录遍历 ==========
+def _walk_files(root, max_depth=None):
+    """迭代遍历目录树，逐个产出文件的DirEntry
+
+    相比Path.rglob('*')：不为每个条目构造Path对象，
+    is_file/is_dir直接用scandir缓存的结果（Windows上
+    FindNextFile已经带回了类型位），不再逐个stat。
+    max_depth限制递归层数（根目录算第0层），并且不跟随
+    符号链接，避免掉进链接成环的深层目录（如Windows家目录
+    里挂载的WSL盘）。
+    """
+    stack = [(root, 0)]
+    while stack:
+        d, depth = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if max_depth is None or depth < max_depth:
+                                stack.append((entry.path, depth + 1))
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError as e:
+            log_error(f"读取目录失败 {d}: {e}")
+            continue
+
+
 # ========== 自动文件夹检测 ==========
 class FolderDetector:
     """自动检测可能包含媒体文件的文件夹"""
     
-    VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
-    AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
-    
+    VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'})
+    AUDIO_EXTENSIONS = frozenset({'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'})
+
+    # {路径: [视频数, 音频数, 顶层mtime_ns]}，随配置文件持久化；
+    # 目录的直接子项一变顶层mtime就变，足够当"像媒体目录"的信号用
+    _folder_cache = {}
+
     @classmethod
     def get_common_folders(cls):
         """获取常用文件夹列表"""
@@ -149,32 +196,52 @@ class FolderDetector:
     
     @classmethod
     def scan_for_media(cls, folder, max_depth=2):
-        """扫描文件夹中的媒体文件数量"""
+        """扫描文件夹中的媒体文件数量（顶层mtime没变时直接用缓存）"""
         video_count = 0
         audio_count = 0
-        
+
+        key = os.fspath(folder)
         try:
-            for i, file_path in enumerate(Path(folder).rglob('*')):
-                if i > 1000:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None:
+            cached = cls._folder_cache.get(key)
+            if cached and cached[2] == mtime:
+                return cached[0], cached[1]
+
+        try:
+            # 全程用字符串路径计数，不构造Path对象；深度受max_depth约束，
+            # 媒体文件数一到上限就停，遍历时间和内存都有界
+            for entry in _walk_files(os.fspath(folder), max_depth=max_depth):
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext in cls.VIDEO_EXTENSIONS:
+                    video_count += 1
+                elif ext in cls.AUDIO_EXTENSIONS:
+                    audio_count += 1
+                if video_count + audio_count >= 1000:
                     break
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in cls.VIDEO_EXTENSIONS:
-                        video_count += 1
-                    elif ext in cls.AUDIO_EXTENSIONS:
-                        audio_count += 1
         except Exception as e:
             log_error(f"扫描文件夹失败: {e}")
-            
+
+        if mtime is not None:
+            cls._folder_cache[key] = [video_count, audio_count, mtime]
         return video_count, audio_count
     
     @classmethod
     def find_best_source_folder(cls):
         """找到最适合作为源目录的文件夹"""
+        folders = cls.get_common_folders()
+        if not folders:
+            return None
+
+        # 每个候选目录一个工作线程并发扫描：os.scandir在系统调用期间
+        # 释放GIL，网络盘/慢速盘上总耗时从各目录之和变成最慢的那个
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = list(executor.map(cls.scan_for_media, folders))
+
         candidates = []
-        
-        for folder in cls.get_common_folders():
-            video_count, audio_count = cls.scan_for_media(folder)
+        for folder, (video_count, audio_count) in zip(folders, counts):
             score = video_count + audio_count
             if video_count > 0 and audio_count > 0:
                 score += 100
@@ -191,8 +258,8 @@ class FolderDetector:
 class VideoAudioMergerGUI:
     """视频音频合成工具的GUI版本"""
     
-    VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
-    AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
+    VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'})
+    AUDIO_EXTENSIONS = frozenset({'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'})
     
     def __init__(self, root):
         log_info("初始化GUI...")
@@ -224,9 +291,12 @@ class VideoAudioMergerGUI:
         
         self.matches = []
         self.is_running = False
+        self._log_buf = []
+        self._log_pending = False
         
         self.config_file = Path.home() / '.video_audio_merger_v2.json'
-        
+        self._config_hash = None
+
         log_info("加载配置...")
         self.load_config()
         
@@ -279,12 +349,18 @@ class VideoAudioMergerGUI:
                     self.similarity_threshold.set(config.get('similarity_threshold', 0.8))
                     self.max_workers.set(config.get('max_workers', 2))
                     self.use_source_as_output.set(config.get('use_source_as_output', True))
+                    # 文件夹扫描缓存：启动时的自动检测据此跳过没变的目录
+                    cache = config.get('folder_cache')
+                    if isinstance(cache, dict):
+                        FolderDetector._folder_cache = {
+                            k: v for k, v in cache.items()
+                            if isinstance(v, list) and len(v) == 3}
                 log_info("配置加载成功")
         except Exception as e:
             log_error(f"加载配置失败: {e}")
                 
     def save_config(self):
-        """保存配置"""
+        """保存配置（内容没变就不写盘；写盘用临时文件+替换，避免写一半被读到）"""
         try:
             config = {
                 'ffmpeg_path': self.ffmpeg_path.get(),
@@ -293,10 +369,17 @@ class VideoAudioMergerGUI:
                 'output_suffix': self.output_suffix.get(),
                 'similarity_threshold': self.similarity_threshold.get(),
                 'max_workers': self.max_workers.get(),
-                'use_source_as_output': self.use_source_as_output.get()
+                'use_source_as_output': self.use_source_as_output.get(),
+                'folder_cache': FolderDetector._folder_cache
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            text = json.dumps(config, ensure_ascii=False, separators=(',', ':'))
+            config_hash = hash(text)
+            if config_hash == self._config_hash:
+                return
+            tmp = self.config_file.with_suffix('.json.tmp')
+            tmp.write_text(text, encoding='utf-8')
+            os.replace(tmp, self.config_file)
+            self._config_hash = config_hash
         except Exception as e:
             log_error(f"保存配置失败: {e}")
             
@@ -461,17 +544,22 @@ class VideoAudioMergerGUI:
                     Path('/usr/local/bin/ffmpeg'),
                 ]
             
-            for path in os.environ.get('PATH', '').split(os.pathsep):
-                exe = 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg'
-                common_paths.append(Path(path) / exe)
-            
+            # 先试常见安装位置，再用shutil.which一次性解析PATH
+            # （原来逐个PATH条目exists()+verify，最多跑几十次子进程）
+            found = None
             for path in common_paths:
                 if path.exists():
-                    self.ffmpeg_path.set(str(path))
-                    if self.verify_ffmpeg():
-                        self.log(f"✓ 找到FFmpeg: {path}")
-                        return
-                        
+                    found = str(path)
+                    break
+            if not found:
+                found = shutil.which('ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
+
+            if found:
+                self.ffmpeg_path.set(found)
+                if self.verify_ffmpeg():
+                    self.log(f"✓ 找到FFmpeg: {found}")
+                    return
+
             self.log("✗ 未找到FFmpeg")
             messagebox.showwarning("未找到", "未找到FFmpeg，请手动指定路径")
         except Exception as e:
@@ -547,88 +635,211 @@ class VideoAudioMergerGUI:
             return False
             
     def log(self, message):
-        """添加日志"""
+        """添加日志（先进缓冲，定时一次性刷入文本框，避免每条都触发重绘）"""
         try:
-            from datetime import datetime
             timestamp = datetime.now().strftime("%H:%M:%S")
-            self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.log_text.see(tk.END)
-            self.root.update_idletasks()
+            self._log_buf.append(f"[{timestamp}] {message}\n")
+            if not self._log_pending:
+                self._log_pending = True
+                self.root.after(100, self._flush_log)
         except Exception as e:
             log_error(f"添加日志失败: {e}")
+
+    def _flush_log(self):
+        """把缓冲的日志一次插入文本框"""
+        try:
+            self._log_pending = False
+            if not self._log_buf:
+                return
+            self.log_text.insert(tk.END, ''.join(self._log_buf))
+            self._log_buf.clear()
+            self.log_text.see(tk.END)
+        except Exception as e:
+            log_error(f"刷新日志失败: {e}")
         
     def scan_files(self):
-        """扫描文件"""
+        """扫描文件（只做校验，重活交给工作线程，界面不再卡死）"""
         try:
+            if getattr(self, '_scan_thread', None) and self._scan_thread.is_alive():
+                return
+
             directory = self.source_dir.get()
             if not directory:
                 messagebox.showwarning("警告", "请先选择源目录")
                 return
-                
+
             if not Path(directory).exists():
                 messagebox.showerror("错误", "源目录不存在")
                 return
-                
+
             self.log(f"正在扫描: {directory}")
             self.status_label.config(text="正在扫描...")
-            
+            self.scan_btn.config(state=tk.DISABLED)
+
+            # Tk变量只在主线程读，快照后传给工作线程
+            threshold = self.similarity_threshold.get()
+            self._scan_queue = queue.Queue()
+            self._scan_thread = threading.Thread(
+                target=self._do_scan, args=(directory, threshold), daemon=True)
+            self._scan_thread.start()
+            self.root.after(50, self._drain_scan_queue)
+        except Exception as e:
+            log_error(f"扫描文件失败: {e}")
+            messagebox.showerror("错误", f"扫描失败: {e}")
+
+    def _do_scan(self, directory, threshold):
+        """工作线程：目录遍历 + 匹配，结果通过队列交回主线程"""
+        try:
             video_files = []
             audio_files = []
-            
-            for file_path in Path(directory).rglob('*'):
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in self.VIDEO_EXTENSIONS:
-                        video_files.append(file_path)
-                    elif ext in self.AUDIO_EXTENSIONS:
-                        audio_files.append(file_path)
-                        
-            self.log(f"视频: {len(video_files)}, 音频: {len(audio_files)}")
-            
+
+            # 共用scandir遍历；只为扩展名命中的条目构造Path。
+            # 扩展名集合取成局部变量，省掉每个条目一次属性查找
+            VEXT = self.VIDEO_EXTENSIONS
+            AEXT = self.AUDIO_EXTENSIONS
+            splitext = os.path.splitext
+            for entry in _walk_files(directory):
+                ext = splitext(entry.name)[1].lower()
+                if ext in VEXT:
+                    video_files.append(Path(entry.path))
+                elif ext in AEXT:
+                    audio_files.append(Path(entry.path))
+
+            self._scan_queue.put(("log", f"视频: {len(video_files)}, 音频: {len(audio_files)}"))
+
             if not video_files or not audio_files:
-                messagebox.showinfo("提示", "需要同时存在视频和音频文件")
+                self._scan_queue.put(("done", len(video_files), len(audio_files), None))
                 return
-                
-            self.matches = self.match_files(video_files, audio_files)
-            
-            if not self.matches:
-                self.log("未找到匹配的文件对")
-                return
-                
-            exact_count = sum(1 for m in self.matches if m['match_type'] == 'exact')
-            self.log(f"完全匹配: {exact_count}, 总计: {len(self.matches)}")
-            
-            self.stats_label.config(text=f"视频: {len(video_files)} | 音频: {len(audio_files)} | 匹配: {len(self.matches)}")
-            self.preview_btn.config(state=tk.NORMAL)
-            self.merge_btn.config(state=tk.NORMAL)
-            self.status_label.config(text=f"找到 {len(self.matches)} 对匹配")
+
+            matches = self.match_files(video_files, audio_files, threshold)
+            self._scan_queue.put(("done", len(video_files), len(audio_files), matches))
         except Exception as e:
-            log_error(f"扫描文件失败: {e}")
-            messagebox.showerror("错误", f"扫描失败: {e}")
-            
-    def match_files(self, video_files, audio_files):
+            log_error(f"扫描线程失败: {e}")
+            self._scan_queue.put(("done", 0, 0, []))
+
+    def _drain_scan_queue(self):
+        """主线程：取出扫描线程的消息并更新界面"""
+        try:
+            while True:
+                try:
+                    item = self._scan_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] == "log":
+                    self.log(item[1])
+                elif item[0] == "done":
+                    self._scan_done(item[1], item[2], item[3])
+                    return
+            self.root.after(50, self._drain_scan_queue)
+        except Exception as e:
+            log_error(f"刷新扫描进度失败: {e}")
+
+    def _scan_done(self, video_count, audio_count, matches):
+        """主线程：扫描收尾，恢复按钮并展示结果"""
+        self.scan_btn.config(state=tk.NORMAL)
+
+        if matches is None:
+            messagebox.showinfo("提示", "需要同时存在视频和音频文件")
+            self.status_label.config(text="就绪")
+            return
+
+        self.matches = matches
+        if not matches:
+            self.log("未找到匹配的文件对")
+            self.status_label.config(text="未找到匹配")
+            return
+
+        exact_count = sum(1 for m in matches if m['match_type'] == 'exact')
+        self.log(f"完全匹配: {exact_count}, 总计: {len(matches)}")
+
+        self.stats_label.config(text=f"视频: {video_count} | 音频: {audio_count} | 匹配: {len(matches)}")
+        self.preview_btn.config(state=tk.NORMAL)
+        self.merge_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=f"找到 {len(matches)} 对匹配")
+
+    def match_files(self, video_files, audio_files, threshold=None):
         """匹配文件"""
         try:
-            threshold = self.similarity_threshold.get()
+            if threshold is None:
+                threshold = self.similarity_threshold.get()
             matches = []
-            matched_audio = set()
+            matched_audio = set()  # 存id(audio)：一次调用内对象稳定，整数哈希比整条路径字符串便宜
             
-            audio_dict = {}
+            audio_dict = defaultdict(list)
             for audio in audio_files:
-                stem = audio.stem
-                if stem not in audio_dict:
-                    audio_dict[stem] = []
-                audio_dict[stem].append(audio)
+                audio_dict[audio.stem].append(audio)
                 
+            matched_video_ids = set()
             for video in video_files:
                 video_stem = video.stem
                 if video_stem in audio_dict:
                     for audio in audio_dict[video_stem]:
-                        if str(audio) not in matched_audio:
+                        if id(audio) not in matched_audio:
                             matches.append({'video': video, 'audio': audio, 'match_type': 'exact', 'similarity': 1.0})
-                            matched_audio.add(str(audio))
+                            matched_audio.add(id(audio))
+                            matched_video_ids.add(id(video))
                             break
-                            
+
+            # 全部视频都精确命中，或音频已被用完时，整个相似匹配阶段都省掉
+            if len(matches) == len(video_files) or len(matched_audio) == len(audio_files):
+                return matches
+
+            # 相似匹配：调试版之前只做完全匹配，界面上的相似度阈值形同虚设。
+            # 已匹配视频按对象身份记录，这里是O(V)而不是逐个遍历matches的O(V·M)
+            unmatched_videos = [v for v in video_files if id(v) not in matched_video_ids]
+            # 未匹配音频用整数下标表示：主干只从Path里取一次，
+            # 集合/分桶操作都落在机器字大小的int上。
+            # B站文件名里大小写、全半角标点经常不一致，先做一次
+            # NFKC+casefold归一化（每个文件一次，不在V×A内层循环里做）
+            audio_norms = [unicodedata.normalize('NFKC', a.stem).casefold() for a in audio_files]
+            unmatched_idx = [i for i, a in enumerate(audio_files) if id(a) not in matched_audio]
+
+            # 按主干长度分桶：长度比达不到阈值的组合ratio必然低于阈值，根本不用比
+            by_len = defaultdict(list)
+            for i in unmatched_idx:
+                by_len[len(audio_norms[i])].append(i)
+
+            sm = SequenceMatcher()
+            for video in unmatched_videos:
+                video_stem = unicodedata.normalize('NFKC', video.stem).casefold()
+                lv = len(video_stem)
+                # 由ratio的长度上界 2*min(la,lv)/(la+lv) >= threshold 推出候选长度窗口，
+                # 再加一点浮点余量避免边界上的候选被误排除
+                lo = math.ceil(threshold * lv / (2 - threshold) - 1e-9)
+                hi = (math.floor(lv * (2 - threshold) / threshold + 1e-9)
+                      if threshold > 0 else max(by_len, default=0))
+                # seq2的索引表只建一次，所有候选音频复用
+                sm.set_seq2(video_stem)
+                best_idx = -1
+                best_score = 0
+
+                for length in range(lo, hi + 1):
+                    for i in by_len.get(length, ()):
+                        audio_stem = audio_norms[i]
+                        # 主干完全相同时直接命中，一次字符串比较替代整个匹配计算
+                        if audio_stem == video_stem:
+                            best_idx = i
+                            best_score = 1.0
+                            break
+                        sm.set_seq1(audio_stem)
+                        # 两级快速上界：达不到阈值就不做完整的匹配块计算
+                        if sm.real_quick_ratio() < threshold or sm.quick_ratio() < threshold:
+                            continue
+                        score = sm.ratio()
+                        if score > best_score and score >= threshold:
+                            best_score = score
+                            best_idx = i
+                            # 接近满分就不再找更好的了，0.99留点浮点余量
+                            if score >= 0.99:
+                                break
+                    if best_score >= 0.99:
+                        break
+
+                if best_idx >= 0:
+                    matches.append({'video': video, 'audio': audio_files[best_idx],
+                                    'match_type': 'similar', 'similarity': best_score})
+                    by_len[len(audio_norms[best_idx])].remove(best_idx)
+
             return matches
         except Exception as e:
             log_error(f"匹配文件失败: {e}")
@@ -691,44 +902,29 @@ class VideoAudioMergerGUI:
         self.log("正在停止...")
         
     def merge_all(self):
-        """合成所有文件"""
+        """合成所有文件（asyncio信号量限流，等待子进程不再占用线程）"""
         try:
+            import asyncio
+
+            # Tk变量先一次性快照，协程里不再碰
             output_dir = self.output_dir.get() or self.source_dir.get()
             suffix = self.output_suffix.get()
             overwrite = self.overwrite.get()
             max_workers = self.max_workers.get()
-            
+            use_source = self.use_source_as_output.get()
+            ffmpeg = self.ffmpeg_path.get()
+
             total = len(self.matches)
-            success_count = 0
-            
+
             self.progress['maximum'] = total
             self.progress['value'] = 0
-            
+
             self.log(f"\n开始合成 {total} 个文件...")
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_match = {executor.submit(self.merge_single, match, output_dir, suffix, overwrite): match for match in self.matches}
-                
-                for future in as_completed(future_to_match):
-                    if not self.is_running:
-                        executor.shutdown(wait=False)
-                        break
-                        
-                    match = future_to_match[future]
-                    try:
-                        success, message = future.result()
-                        if success:
-                            success_count += 1
-                            self.log(f"✓ {match['video'].name}")
-                        else:
-                            self.log(f"✗ {match['video'].name}: {message}")
-                    except Exception as e:
-                        self.log(f"✗ {match['video'].name}: {e}")
-                        
-                    self.progress['value'] += 1
-                    self.status_label.config(text=f"进度: {self.progress['value']}/{total}")
-                    self.root.update_idletasks()
-                    
+
+            success_count = asyncio.run(self._merge_async(
+                list(self.matches), ffmpeg, output_dir, suffix,
+                overwrite, use_source, max_workers, total))
+
             self.log(f"完成: {success_count}/{total} 成功")
             
             self.is_running = False
@@ -744,44 +940,73 @@ class VideoAudioMergerGUI:
         except Exception as e:
             log_error(f"合成失败: {e}")
             
-    def merge_single(self, match, output_dir, suffix, overwrite):
-        """合成单个文件"""
-        try:
+    async def _merge_async(self, matches, ffmpeg, output_dir, suffix,
+                           overwrite, use_source, max_workers, total):
+        """asyncio驱动的合成主体：信号量限制并发的ffmpeg子进程数"""
+        import asyncio
+
+        sem = asyncio.Semaphore(max(1, max_workers))
+        success_count = 0
+
+        async def merge_one(match):
+            nonlocal success_count
             video = match['video']
             audio = match['audio']
-            
-            if self.use_source_as_output.get():
+
+            if use_source:
                 output_path = video.parent / f"{video.stem}{suffix}{video.suffix}"
             else:
                 output_path = Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
-                
+
             if output_path.exists() and not overwrite:
-                return False, "文件已存在"
-                
-            cmd = [
-                self.ffmpeg_path.get(),
-                '-i', str(video),
-                '-i', str(audio),
-                '-c:v', 'copy',
-                '-c:a', 'aac',
-                '-map', '0:v:0',
-                '-map', '1:a:0',
-                '-shortest',
-                '-y' if overwrite else '-n',
-                str(output_path)
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', 
-                                   errors='ignore', timeout=300)
-            
-            if result.returncode == 0:
-                return True, str(output_path)
+                success, message = False, "文件已存在"
             else:
-                error = result.stderr[-200:] if result.stderr else "未知错误"
-                return False, error
-        except Exception as e:
-            log_error(f"合成单个文件失败: {e}")
-            return False, str(e)
+                cmd = [
+                    ffmpeg,
+                    '-i', str(video),
+                    '-i', str(audio),
+                    '-c:v', 'copy',
+                    '-c:a', 'aac',
+                    '-map', '0:v:0',
+                    '-map', '1:a:0',
+                    '-shortest',
+                    '-y' if overwrite else '-n',
+                    str(output_path)
+                ]
+                async with sem:
+                    if not self.is_running:
+                        return
+                    try:
+                        proc = await asyncio.create_subprocess_exec(
+                            *cmd,
+                            stdout=asyncio.subprocess.DEVNULL,
+                            stderr=asyncio.subprocess.PIPE)
+                        try:
+                            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=300)
+                        except asyncio.TimeoutError:
+                            proc.kill()
+                            await proc.wait()
+                            raise
+                        if proc.returncode == 0:
+                            success, message = True, str(output_path)
+                        else:
+                            error = stderr.decode('utf-8', 'ignore') if stderr else ''
+                            success, message = False, (error[-200:] or "未知错误")
+                    except Exception as e:
+                        log_error(f"合成单个文件失败: {e}")
+                        success, message = False, str(e)
+
+            if success:
+                success_count += 1
+                self.log(f"✓ {video.name}")
+            else:
+                self.log(f"✗ {video.name}: {message}")
+
+            self.progress['value'] += 1
+            self.status_label.config(text=f"进度: {self.progress['value']}/{total}")
+
+        await asyncio.gather(*(merge_one(match) for match in matches))
+        return success_count
             
     def on_closing(self):
         """窗口关闭"""
@@ -6,13 +6,19 @@
 """
 
 import os
+import re
 import sys
 import json
+import queue
 import subprocess
 import threading
+import time
+from collections import defaultdict, deque
 from pathlib import Path
-from difflib import SequenceMatcher
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 匹配、合成要等用户点按钮才会发生，涉及的模块
+# （asyncio、difflib、rapidfuzz、concurrent.futures）
+# 都推迟到对应函数里再导入，缩短主窗口出现前的冷启动时间
 
 try:
     import tkinter as tk
@@ -36,33 +42,170 @@ def setup_high_dpi():
             # windll.user32.SetProcessDPIAware()
         except:
             pass
-    
-    # 尝试检测屏幕DPI并设置缩放
+
+        # Win10 1607+可以直接问系统DPI，
+        # 省掉一次临时Tcl/Tk解释器的启动和销毁
+        try:
+            from ctypes import windll
+            return windll.user32.GetDpiForSystem() / 96.0
+        except:
+            pass
+
+    # 其他平台（或旧版Windows）：用临时Tk窗口探测屏幕DPI
     try:
         root = tk.Tk()
         root.withdraw()
-        
+
         # 获取屏幕DPI
         dpi = root.winfo_fpixels('1i')
         scale_factor = dpi / 96.0  # 96是标准DPI
-        
+
         # 设置缩放
         if scale_factor > 1.0:
             root.tk.call('tk', 'scaling', scale_factor)
-            
+
         root.destroy()
         return scale_factor
     except:
         return 1.0
 
 
+# ========== 扩展名分类 ==========
+# 一次C层正则匹配 + 字典查表完成视频/音频分类，
+# 扫描热路径上不再走PurePath.suffix解析和逐条.lower()。
+# 正则只负责切出扩展名，媒体类型全部由字典决定——
+# 增删格式只需要改下面两个元组
+_VIDEO_EXTS = ('mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm', 'm4v')
+_AUDIO_EXTS = ('m4a', 'mp3', 'aac', 'wav', 'flac', 'ogg', 'wma', 'mka')
+_EXT_RE = re.compile(r'\.([A-Za-z0-9]+)$')
+_EXT_KIND = {e: 'v' for e in _VIDEO_EXTS}
+_EXT_KIND.update({e: 'a' for e in _AUDIO_EXTS})
+
+
+# 可选加速：rapidfuzz用C++实现同族相似度算法，带长度预筛，
+# 未安装时回退到标准库difflib。首次匹配时才尝试导入
+# 可选加速：orjson的C序列化比标准库json快几倍，未安装时回退
+try:
+    import orjson as _orjson
+
+    def _dump_config(obj):
+        return _orjson.dumps(obj, option=_orjson.OPT_INDENT_2)
+except ImportError:
+    def _dump_config(obj):
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+# 日志时间戳缓存：[整数秒, 格式化结果]。
+# 同一秒内的日志复用字符串，不重复走strftime
+_LAST_TS = [0, '']
+
+
+def _timestamp():
+    """当前时间的HH:MM:SS，同一秒内只格式化一次"""
+    t = int(time.time())
+    if t != _LAST_TS[0]:
+        _LAST_TS[0] = t
+        _LAST_TS[1] = time.strftime('%H:%M:%S', time.localtime(t))
+    return _LAST_TS[1]
+
+
+_rf_fuzz = _rf_process = None
+_rf_checked = False
+
+
+def _get_rapidfuzz():
+    """延迟导入rapidfuzz，导入结果缓存在模块级"""
+    global _rf_fuzz, _rf_process, _rf_checked
+    if not _rf_checked:
+        _rf_checked = True
+        try:
+            from rapidfuzz import fuzz as _rf_fuzz_mod, process as _rf_process_mod
+            _rf_fuzz, _rf_process = _rf_fuzz_mod, _rf_process_mod
+        except ImportError:
+            pass
+    return _rf_fuzz, _rf_process
+
+
+# ========== 目录遍历 ==========
+# 这些目录里不会有用户的媒体文件，但条目数动辄上万，
+# 不剪掉的话计数上限会被它们白白吃满
+_SKIP_DIRS = frozenset({
+    'node_modules', '.git', '__pycache__', '$RECYCLE.BIN',
+    'AppData', 'Library', '.cache',
+})
+
+
+def _walk_files(root, max_depth=None, skip_dirs=frozenset()):
+    """广度优先遍历目录树，逐个产出文件的DirEntry
+
+    相比Path.rglob('*')：不为每个条目构造Path对象，
+    is_file/is_dir直接用scandir缓存的结果，不再额外stat。
+    广度优先让浅层文件先产出，配合条目上限使用时
+    不会在某个深层子树里耗尽配额。
+    """
+    pending = deque([(root, 0)])
+    while pending:
+        d, depth = pending.popleft()
+        try:
+            with os.scandir(d) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (entry.name not in skip_dirs
+                                    and (max_depth is None or depth < max_depth)):
+                                pending.append((entry.path, depth + 1))
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
 # ========== 自动文件夹检测 ==========
 class FolderDetector:
     """自动检测可能包含媒体文件的文件夹"""
     
     VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
     AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
-    
+
+    # (路径, mtime_ns) -> (视频数, 音频数)。启动时find_best_source_folder
+    # 和之后的auto_detect_source/browse会反复扫同一批目录，目录没变时
+    # 直接查表；mtime变了键就不同，自然失效，无需主动清理
+    _scan_cache = {}
+    _cache_file = Path.home() / '.video_audio_merger_v2_scan_cache.json'
+    _cache_loaded = False
+
+    @classmethod
+    def _load_cache(cls):
+        """从磁盘加载扫描缓存（只在首次扫描时调用一次）"""
+        cls._cache_loaded = True
+        try:
+            with open(cls._cache_file, 'r', encoding='utf-8') as f:
+                for path, mtime_ns, v, a in json.load(f):
+                    cls._scan_cache[(path, mtime_ns)] = (v, a)
+        except (OSError, ValueError, TypeError):
+            pass
+        # 用atexit兜底落盘：即使mainloop异常退出没走到on_closing，
+        # 本次扫描的结果下次启动也能命中
+        import atexit
+        atexit.register(cls.save_cache)
+        cls._loaded_snapshot = dict(cls._scan_cache)
+
+    @classmethod
+    def save_cache(cls):
+        """把扫描缓存写回磁盘，下次启动的自动检测可以直接命中"""
+        # 没有新条目就不重写文件（on_closing和atexit都会调到这里）
+        if not cls._scan_cache or cls._scan_cache == getattr(cls, '_loaded_snapshot', None):
+            return
+        cls._loaded_snapshot = dict(cls._scan_cache)
+        try:
+            data = [[p, m, v, a] for (p, m), (v, a) in cls._scan_cache.items()]
+            with open(cls._cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError:
+            pass
+
     @classmethod
     def get_common_folders(cls):
         """获取常用文件夹列表"""
@@ -95,31 +238,53 @@ class FolderDetector:
                 home / 'Documents',
             ]
         
-        for path in common_paths:
-            if path.exists() and path.is_dir():
-                folders.append(path)
-                
+        # 并行stat所有候选目录：Windows上D:/E:盘可能正在唤醒，
+        # 串行检查会被最慢的盘卡住，并行后总耗时取决于最慢的一个
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda p: p.is_dir(), common_paths))
+
+        folders.extend(p for p, ok in zip(common_paths, results) if ok)
         return folders
     
     @classmethod
     def scan_for_media(cls, folder, max_depth=2):
         """扫描文件夹中的媒体文件数量"""
+        if not cls._cache_loaded:
+            cls._load_cache()
+
+        # 顶层目录mtime作为失效信号（下载新文件都落在顶层，足够敏感）
+        try:
+            key = (str(folder), os.stat(folder).st_mtime_ns)
+        except OSError:
+            key = None
+
+        if key is not None and key in cls._scan_cache:
+            return cls._scan_cache[key]
+
         video_count = 0
         audio_count = 0
-        
+
         try:
-            for i, file_path in enumerate(Path(folder).rglob('*')):
+            # 只做计数，整个过程不构造Path对象；
+            # 限制深度并剪掉噪音目录，让上限配额花在真正的媒体文件上
+            entries = _walk_files(str(folder), max_depth=max_depth,
+                                  skip_dirs=_SKIP_DIRS)
+            for i, entry in enumerate(entries):
                 if i > 1000:  # 限制扫描数量
                     break
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in cls.VIDEO_EXTENSIONS:
-                        video_count += 1
-                    elif ext in cls.AUDIO_EXTENSIONS:
-                        audio_count += 1
+                m = _EXT_RE.search(entry.name)
+                kind = _EXT_KIND.get(m.group(1).lower()) if m else None
+                if kind == 'v':
+                    video_count += 1
+                elif kind == 'a':
+                    audio_count += 1
         except:
             pass
-            
+
+        if key is not None:
+            cls._scan_cache[key] = (video_count, audio_count)
         return video_count, audio_count
     
     @classmethod
@@ -192,12 +357,31 @@ class VideoAudioMergerGUI:
         self.max_workers = tk.IntVar(value=2)
         self.overwrite = tk.BooleanVar(value=False)
         self.use_source_as_output = tk.BooleanVar(value=True)
+        # B站音轨本身就是AAC，直接copy免去整条重编码流水线
+        self.copy_audio_when_possible = tk.BooleanVar(value=True)
         
         self.matches = []
         self.is_running = False
+
+        # 工作线程 -> 主线程的结果队列；100ms批量刷一次界面，
+        # 不为每个完成的任务单独往Tk事件循环里塞回调
+        self._progress_q = queue.Queue()
+
+        # 日志同理：log()只入队，渲染由主线程定时批量完成
+        self._log_q = queue.Queue()
+
+        # 正在运行的ffmpeg进程句柄：停止时逐个terminate，
+        # 而不是只置标志位等它们自己跑完
+        self._live_procs = set()
+        self._live_procs_lock = threading.Lock()
+
+        # 已验证过的ffmpeg指纹(路径, mtime_ns) -> 版本行；
+        # 每次点"开始合成"都会走verify，二进制没换就不再spawn子进程
+        self._ffmpeg_verified = {}
         
         # 配置文件路径
         self.config_file = Path.home() / '.video_audio_merger_v2.json'
+        self._last_config_bytes = None  # 上次落盘的序列化内容，没变就不重写
         
         # 加载配置
         self.load_config()
@@ -211,6 +395,9 @@ class VideoAudioMergerGUI:
         
         # 检查FFmpeg
         self.root.after(100, self.check_ffmpeg_on_startup)
+
+        # 启动日志刷新循环
+        self.root.after(100, self._flush_log)
         
     def setup_styles(self):
         """设置样式（适配高DPI）"""
@@ -263,6 +450,7 @@ class VideoAudioMergerGUI:
                     self.similarity_threshold.set(config.get('similarity_threshold', 0.8))
                     self.max_workers.set(config.get('max_workers', 2))
                     self.use_source_as_output.set(config.get('use_source_as_output', True))
+                    self.copy_audio_when_possible.set(config.get('copy_audio_when_possible', True))
             except Exception as e:
                 print(f"加载配置失败: {e}")
                 
@@ -275,11 +463,22 @@ class VideoAudioMergerGUI:
             'output_suffix': self.output_suffix.get(),
             'similarity_threshold': self.similarity_threshold.get(),
             'max_workers': self.max_workers.get(),
-            'use_source_as_output': self.use_source_as_output.get()
+            'use_source_as_output': self.use_source_as_output.get(),
+            'copy_audio_when_possible': self.copy_audio_when_possible.get()
         }
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            data = _dump_config(config)
+            if data == self._last_config_bytes:
+                return
+            if self._last_config_bytes is None and self.config_file.exists() \
+                    and self.config_file.read_bytes() == data:
+                self._last_config_bytes = data
+                return
+            # 先写临时文件再原子替换，中途崩溃不会留下半个配置
+            tmp = self.config_file.with_suffix('.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, self.config_file)
+            self._last_config_bytes = data
         except Exception as e:
             print(f"保存配置失败: {e}")
             
@@ -307,10 +506,12 @@ class VideoAudioMergerGUI:
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
         
-        # 鼠标滚轮支持
+        # 鼠标滚轮支持：只在指针位于Canvas上方时接管全局滚轮事件，
+        # 否则在日志框/预览表里滚动也会连带滚主界面，双重滚动还多一次重绘
         def on_mousewheel(event):
             canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", on_mousewheel)
+        canvas.bind("<Enter>", lambda e: canvas.bind_all("<MouseWheel>", on_mousewheel))
+        canvas.bind("<Leave>", lambda e: canvas.unbind_all("<MouseWheel>"))
         
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -422,6 +623,8 @@ class VideoAudioMergerGUI:
         workers_spin.pack(side=tk.LEFT, padx=5)
         
         ttk.Checkbutton(row1, text="覆盖已存在文件", variable=self.overwrite).pack(side=tk.LEFT, padx=(20, 0))
+        ttk.Checkbutton(row1, text="音轨兼容时直接复制（更快）",
+                        variable=self.copy_audio_when_possible).pack(side=tk.LEFT, padx=(20, 0))
         
         # ===== 操作按钮 =====
         button_frame = ttk.Frame(scrollable_frame)
@@ -598,6 +801,7 @@ class VideoAudioMergerGUI:
     def on_closing(self):
         """窗口关闭时保存配置"""
         self.save_config()
+        FolderDetector.save_cache()
         self.root.destroy()
         
     def browse_ffmpeg(self):
@@ -633,7 +837,17 @@ class VideoAudioMergerGUI:
         if not path or not Path(path).exists():
             self.ffmpeg_status.config(text="状态: FFmpeg 路径无效", foreground="red")
             return False
-            
+
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            key = None
+
+        if key is not None and key in self._ffmpeg_verified:
+            version = self._ffmpeg_verified[key]
+            self.ffmpeg_status.config(text=f"✓ {version[:50]}...", foreground="green")
+            return True
+
         try:
             result = subprocess.run(
                 [path, '-version'],
@@ -643,6 +857,8 @@ class VideoAudioMergerGUI:
             )
             if result.returncode == 0:
                 version = result.stdout.split('\n')[0]
+                if key is not None:
+                    self._ffmpeg_verified[key] = version
                 self.ffmpeg_status.config(text=f"✓ {version[:50]}...", foreground="green")
                 self.save_config()
                 return True
@@ -654,12 +870,21 @@ class VideoAudioMergerGUI:
             return False
             
     def log(self, message):
-        """添加日志"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        """添加日志（只入队，任何线程都能安全调用）"""
+        self._log_q.put_nowait(f"[{_timestamp()}] {message}")
+
+    def _flush_log(self):
+        """主线程：把积压的日志行合成一次insert，文本框只重排一次"""
+        lines = []
+        while True:
+            try:
+                lines.append(self._log_q.get_nowait())
+            except queue.Empty:
+                break
+        if lines:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+            self.log_text.see(tk.END)
+        self.root.after(100, self._flush_log)
         
     def scan_files(self):
         """扫描文件"""
@@ -676,18 +901,19 @@ class VideoAudioMergerGUI:
         self.status_label.config(text="正在扫描...")
         self.root.update()
         
-        # 扫描文件
+        # 扫描文件（只为扩展名命中的条目构造Path对象）
         video_files = []
         audio_files = []
-        
-        for file_path in Path(directory).rglob('*'):
-            if file_path.is_file():
-                ext = file_path.suffix.lower()
-                if ext in self.VIDEO_EXTENSIONS:
-                    video_files.append(file_path)
-                elif ext in self.AUDIO_EXTENSIONS:
-                    audio_files.append(file_path)
-                    
+
+        for entry in _walk_files(directory):
+            m = _EXT_RE.search(entry.name)
+            kind = _EXT_KIND.get(m.group(1).lower()) if m else None
+            if kind == 'v':
+                video_files.append(Path(entry.path))
+            elif kind == 'a':
+                audio_files.append(Path(entry.path))
+
+
         self.log(f"找到 {len(video_files)} 个视频文件, {len(audio_files)} 个音频文件")
         
         if not video_files or not audio_files:
@@ -724,58 +950,97 @@ class VideoAudioMergerGUI:
         self.merge_btn.config(state=tk.NORMAL)
         self.status_label.config(text=f"找到 {len(self.matches)} 对匹配文件")
         
+    @staticmethod
+    def _norm_stem(stem):
+        """归一化文件名主干：小写并去掉下载器附加的常见标记后缀"""
+        s = stem.lower()
+        for tag in ('_video', '_audio', '.video', '.audio'):
+            if s.endswith(tag):
+                s = s[:-len(tag)]
+                break
+        return s
+
     def match_files(self, video_files, audio_files):
         """匹配文件"""
+        from difflib import SequenceMatcher, get_close_matches
+
         threshold = self.similarity_threshold.get()
         matches = []
-        matched_audio = set()
-        
-        # 完全匹配
-        audio_dict = {}
-        for audio in audio_files:
-            stem = audio.stem
-            if stem not in audio_dict:
-                audio_dict[stem] = []
-            audio_dict[stem].append(audio)
-            
-        for video in video_files:
-            video_stem = video.stem
-            if video_stem in audio_dict:
-                for audio in audio_dict[video_stem]:
-                    if str(audio) not in matched_audio:
-                        matches.append({
-                            'video': video,
-                            'audio': audio,
-                            'match_type': 'exact',
-                            'similarity': 1.0
-                        })
-                        matched_audio.add(str(audio))
-                        break
-                        
+
+        # 完全匹配：归一化主干 -> 音频下标列表，
+        # 已匹配状态用下标布尔数组记录，不再逐次哈希整条路径字符串
+        audio_dict = defaultdict(list)
+        for ai, audio in enumerate(audio_files):
+            audio_dict[self._norm_stem(audio.stem)].append(ai)
+
+        matched_audio = [False] * len(audio_files)
+        matched_video = [False] * len(video_files)
+
+        for vi, video in enumerate(video_files):
+            for ai in audio_dict.get(self._norm_stem(video.stem), ()):
+                if not matched_audio[ai]:
+                    matches.append({
+                        'video': video,
+                        'audio': audio_files[ai],
+                        'match_type': 'exact',
+                        'similarity': 1.0
+                    })
+                    matched_audio[ai] = True
+                    matched_video[vi] = True
+                    break
+
         # 相似匹配
-        unmatched_videos = [v for v in video_files if not any(m['video'] == v for m in matches)]
-        unmatched_audios = [a for a in audio_files if str(a) not in matched_audio]
-        
-        for video in unmatched_videos:
-            video_stem = video.stem
-            best_match = None
-            best_score = 0
-            
-            for audio in unmatched_audios:
-                score = SequenceMatcher(None, video_stem, audio.stem).ratio()
-                if score > best_score and score >= threshold:
-                    best_score = score
-                    best_match = audio
-                    
-            if best_match:
-                matches.append({
-                    'video': video,
-                    'audio': best_match,
-                    'match_type': 'similar',
-                    'similarity': best_score
-                })
-                unmatched_audios.remove(best_match)
-                
+        remaining = {}
+        for ai, audio in enumerate(audio_files):
+            if not matched_audio[ai]:
+                remaining.setdefault(audio.stem, ai)
+
+        _rf_fuzz, _rf_process = _get_rapidfuzz()
+        if _rf_process is not None:
+            # rapidfuzz: extractOne内部做长度预筛，明显不相似的候选
+            # 连相似度都不会算
+            choices = list(remaining)
+            for vi, video in enumerate(video_files):
+                if matched_video[vi] or not choices:
+                    continue
+                hit = _rf_process.extractOne(
+                    video.stem, choices,
+                    scorer=_rf_fuzz.ratio,
+                    score_cutoff=threshold * 100
+                )
+                if hit:
+                    stem, score, idx = hit
+                    del choices[idx]
+                    ai = remaining.pop(stem)
+                    matches.append({
+                        'video': video,
+                        'audio': audio_files[ai],
+                        'match_type': 'similar',
+                        'similarity': score / 100.0
+                    })
+        else:
+            # 标准库回退：get_close_matches在C层带长度预筛，
+            # 比逐对SequenceMatcher快得多
+            for vi, video in enumerate(video_files):
+                if matched_video[vi] or not remaining:
+                    continue
+                hits = get_close_matches(video.stem, remaining, n=1, cutoff=threshold)
+                if hits:
+                    stem = hits[0]
+                    ai = remaining.pop(stem)
+                    score = SequenceMatcher(None, video.stem, stem).ratio()
+                    matches.append({
+                        'video': video,
+                        'audio': audio_files[ai],
+                        'match_type': 'similar',
+                        'similarity': score
+                    })
+
+        # 预先取好文件名字符串，预览填表时不再逐行做Path属性解析
+        for m in matches:
+            m['video_name'] = m['video'].name
+            m['audio_name'] = m['audio'].name
+
         return matches
         
     def preview_matches(self):
@@ -815,17 +1080,20 @@ class VideoAudioMergerGUI:
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # 填充数据
+        # 填充数据：插入期间先把显示列收起，批量插完一次性恢复，
+        # 免得每行insert都触发一轮列宽/样式重算
+        tree['displaycolumns'] = ()
         for i, match in enumerate(self.matches, 1):
             match_type = "完全匹配" if match['match_type'] == 'exact' else "相似匹配"
             similarity = f"{match['similarity']:.0%}" if match['match_type'] == 'similar' else "100%"
             tree.insert('', tk.END, values=(
                 i,
                 match_type,
-                match['video'].name,
-                match['audio'].name,
+                match['video_name'],
+                match['audio_name'],
                 similarity
             ))
+        tree['displaycolumns'] = columns
             
     def start_merge(self):
         """开始合成"""
@@ -860,130 +1128,292 @@ class VideoAudioMergerGUI:
         self.preview_btn.config(state=tk.DISABLED)
         self.merge_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
-        
+
+        # 进度状态在主线程初始化
+        self._merge_total = len(self.matches)
+        self._success_count = 0
+        self._done_count = 0
+        self.progress['maximum'] = self._merge_total
+        self.progress['value'] = 0
+
         # 在新线程中运行合成
         thread = threading.Thread(target=self.merge_all)
         thread.daemon = True
         thread.start()
+
+        # 启动进度刷新循环
+        self.root.after(100, self._drain_progress)
         
     def stop_merge(self):
-        """停止合成"""
+        """停止合成：置标志位并终止所有正在运行的ffmpeg"""
         self.is_running = False
+        with self._live_procs_lock:
+            procs = list(self._live_procs)
+        for proc in procs:
+            try:
+                proc.terminate()
+            except (ProcessLookupError, OSError):
+                pass
         self.log("正在停止...")
         
     def merge_all(self):
-        """合成所有文件"""
+        """合成所有文件（工作线程入口）"""
+        # 首次合成时才导入asyncio（之后只是sys.modules查表）
+        import asyncio
+
         output_dir = self.get_output_dir()
         suffix = self.output_suffix.get()
         overwrite = self.overwrite.get()
         max_workers = self.max_workers.get()
-        
+        use_source = self.use_source_as_output.get()
+        copy_audio = self.copy_audio_when_possible.get()
+        ffmpeg = self.ffmpeg_path.get()
+
         total = len(self.matches)
-        success_count = 0
-        
-        self.progress['maximum'] = total
-        self.progress['value'] = 0
-        
+
         self.log(f"\n开始合成 {total} 个文件...")
         self.log(f"输出目录: {output_dir}")
         self.log("="*60)
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_match = {}
-            
-            for match in self.matches:
-                if not self.is_running:
-                    break
-                    
-                future = executor.submit(
-                    self.merge_single,
-                    match,
-                    output_dir,
-                    suffix,
-                    overwrite
-                )
-                future_to_match[future] = match
-                
-            for future in as_completed(future_to_match):
-                if not self.is_running:
-                    executor.shutdown(wait=False)
-                    break
-                    
-                match = future_to_match[future]
+
+        # 预先把每个输出目录listdir成集合：此后"输出是否已存在"
+        # 变成内存查表，不再让每个任务各自stat一次
+        # （输出路径依赖合成时的后缀/目录设置，所以在这里算而不是扫描时）
+        existing = {}
+        if not overwrite:
+            parents = {
+                self._output_path_for(m['video'], output_dir, suffix, use_source).parent
+                for m in self.matches
+            }
+            for parent in parents:
                 try:
-                    success, message = future.result()
-                    if success:
-                        success_count += 1
-                        self.log(f"✓ {match['video'].name}")
-                    else:
-                        self.log(f"✗ {match['video'].name}: {message}")
-                except Exception as e:
-                    self.log(f"✗ {match['video'].name}: {e}")
-                    
-                self.progress['value'] += 1
-                self.status_label.config(text=f"进度: {self.progress['value']}/{total}")
-                self.root.update_idletasks()
-                
-        self.log("="*60)
-        self.log(f"合成完成: {success_count}/{total} 成功")
-        
-        self.is_running = False
-        self.scan_btn.config(state=tk.NORMAL)
-        self.preview_btn.config(state=tk.NORMAL)
-        self.merge_btn.config(state=tk.NORMAL)
-        self.stop_btn.config(state=tk.DISABLED)
-        self.status_label.config(text=f"完成: {success_count}/{total} 成功")
-        
-        # 保存配置
-        self.save_config()
-        
-        messagebox.showinfo("完成", f"合成完成!\n成功: {success_count}\n失败: {total - success_count}")
-        
-    def merge_single(self, match, output_dir, suffix, overwrite):
-        """合成单个文件"""
-        video = match['video']
-        audio = match['audio']
-        
-        if self.use_source_as_output.get():
+                    existing[parent] = set(os.listdir(parent))
+                except OSError:
+                    existing[parent] = set()
+
+        # asyncio驱动子进程：不再为每个任务占一个Python线程，
+        # 信号量精确限制同时运行的ffmpeg数量
+        asyncio.run(self._merge_async(
+            list(self.matches), ffmpeg, output_dir, suffix,
+            overwrite, use_source, copy_audio, max_workers,
+            existing=existing
+        ))
+
+        # None作为结束哨兵，由主线程的刷新循环收尾
+        self._progress_q.put_nowait(None)
+
+    def _output_path_for(self, video, output_dir, suffix, use_source):
+        """计算单个视频的输出路径"""
+        if use_source:
             # 输出到原目录
-            output_path = video.parent / f"{video.stem}{suffix}{video.suffix}"
-        else:
-            # 输出到指定目录
-            output_path = Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
-            
-        if output_path.exists() and not overwrite:
-            return False, "文件已存在"
-            
-        cmd = [
-            self.ffmpeg_path.get(),
+            return video.parent / f"{video.stem}{suffix}{video.suffix}"
+        # 输出到指定目录
+        return Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
+
+    @staticmethod
+    def _audio_codec_args(audio, video_suffix, allow_copy):
+        """选择音频编码参数：源已是AAC时直接流复制，合成退化为封装"""
+        if allow_copy:
+            ext = audio.suffix.lower()
+            if ext == '.m4a':
+                return ['-c:a', 'copy']
+            if ext == '.aac':
+                args = ['-c:a', 'copy']
+                # 裸ADTS流进MP4系容器需要转换为ASC头
+                if video_suffix in ('.mp4', '.m4v', '.mov'):
+                    args += ['-bsf:a', 'aac_adtstoasc']
+                return args
+        return ['-c:a', 'aac']
+
+    @classmethod
+    def _build_cmd(cls, ffmpeg, video, audio, output_path, overwrite, copy_audio,
+                   threads=0):
+        """构建单对合成的ffmpeg命令
+
+        -threads放在输出选项组：ffmpeg的选项是位置相关的，放在-i之前
+        只限制输入的解码线程，限制不到aac编码器。
+        """
+        return [
+            ffmpeg,
             '-i', str(video),
             '-i', str(audio),
             '-c:v', 'copy',
-            '-c:a', 'aac',
+            *cls._audio_codec_args(audio, video.suffix.lower(), copy_audio),
             '-map', '0:v:0',
             '-map', '1:a:0',
+            *(('-threads', str(threads)) if threads else ()),
             '-shortest',
             '-y' if overwrite else '-n',
             str(output_path)
         ]
-        
+
+    async def _run_ffmpeg(self, cmd):
+        """异步运行ffmpeg，返回(返回码, stderr尾部)
+
+        stderr边读边丢，只保留尾部环形缓冲：长视频合成时ffmpeg
+        可能输出上MB的日志，而报错只需要最后几行。
+        进程句柄登记在_live_procs里，供stop_merge终止。
+        """
+        import asyncio
+
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore',
-                timeout=300
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
             )
-            
-            if result.returncode == 0:
-                return True, str(output_path)
-            else:
-                error = result.stderr[-200:] if result.stderr else "未知错误"
-                return False, error
         except Exception as e:
-            return False, str(e)
+            return -1, str(e)
+
+        with self._live_procs_lock:
+            self._live_procs.add(proc)
+        try:
+            tail = deque(maxlen=8)  # 每块4KB，最多保留32KB
+            while True:
+                chunk = await proc.stderr.read(4096)
+                if not chunk:
+                    break
+                tail.append(chunk)
+            rc = await proc.wait()
+            text = b''.join(tail).decode('utf-8', errors='ignore')
+            return rc, text[-200:]
+        except Exception as e:
+            return -1, str(e)
+        finally:
+            with self._live_procs_lock:
+                self._live_procs.discard(proc)
+
+    async def _merge_async(self, matches, ffmpeg, output_dir, suffix,
+                           overwrite, use_source, copy_audio, max_workers,
+                           batch_size=4, existing=None):
+        """并发合成：每批若干对共享一个ffmpeg进程，失败再逐对重试"""
+        import asyncio
+
+        sem = asyncio.Semaphore(max(1, max_workers))
+
+        # 每个ffmpeg限制线程数：N个并发任务各开满CPU线程
+        # 只会互相争抢，按并发数均分
+        threads = max(1, (os.cpu_count() or 4) // max(1, max_workers))
+
+        async def run_pair(match, output_path):
+            cmd = self._build_cmd(ffmpeg, match['video'], match['audio'],
+                                  output_path, overwrite, copy_audio, threads)
+            rc, tail = await self._run_ffmpeg(cmd)
+            ok = rc == 0
+            self._report_result(match, ok, str(output_path) if ok else (tail or "未知错误"))
+            return ok
+
+        async def run_batch(batch):
+            # 先剔除已存在的输出（查预建的目录清单，不逐个stat）
+            pending = []
+            for match in batch:
+                out = self._output_path_for(match['video'], output_dir, suffix, use_source)
+                if not overwrite and out.name in (existing or {}).get(out.parent, ()):
+                    self._report_result(match, False, "文件已存在")
+                else:
+                    pending.append((match, out))
+
+            if not pending:
+                return
+
+            async with sem:
+                if not self.is_running:
+                    for match, _ in pending:
+                        self._report_result(match, False, "已停止")
+                    return
+
+                if len(pending) > 1:
+                    # 多对合一个进程：省下每个进程的启动和编码器初始化开销。
+                    # -threads进每个输出的选项组（位置相关，放-i之前够不到编码器）
+                    cmd = [ffmpeg]
+                    for match, _ in pending:
+                        cmd.extend(['-i', str(match['video']), '-i', str(match['audio'])])
+                    for i, (match, out) in enumerate(pending):
+                        cmd.extend([
+                            '-map', f'{2*i}:v:0', '-map', f'{2*i+1}:a:0',
+                            '-c:v', 'copy',
+                            *self._audio_codec_args(match['audio'],
+                                                    match['video'].suffix.lower(),
+                                                    copy_audio),
+                            '-threads', str(threads),
+                            '-shortest',
+                            '-y' if overwrite else '-n', str(out)
+                        ])
+                    rc, tail = await self._run_ffmpeg(cmd)
+                    if rc == 0:
+                        for match, out in pending:
+                            self._report_result(match, True, str(out))
+                        return
+                    # 批处理失败（常见于个别输入损坏），回退到逐对合成定位问题。
+                    # 失败前可能已写出部分输出：这些是本批的残留（开始前查过
+                    # 不存在），不清掉的话逐对重试的-n会全部撞"已存在"
+                    for _, out in pending:
+                        try:
+                            out.unlink(missing_ok=True)
+                        except OSError:
+                            pass
+
+                for match, out in pending:
+                    if not self.is_running:
+                        self._report_result(match, False, "已停止")
+                        continue
+                    await run_pair(match, out)
+
+        batches = [matches[i:i + batch_size] for i in range(0, len(matches), batch_size)]
+        await asyncio.gather(*(run_batch(b) for b in batches))
+
+    def _report_result(self, match, success, message):
+        """把单对结果放进队列（不直接碰Tk，线程安全）"""
+        self._progress_q.put_nowait((match, success, message))
+
+    def _drain_progress(self):
+        """主线程：批量取出工作线程的结果，进度条和状态各刷一次"""
+        finished = False
+        done_now = 0
+
+        while True:
+            try:
+                item = self._progress_q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                continue
+            match, success, message = item
+            if success:
+                self._success_count += 1
+                self.log(f"✓ {match['video'].name}")
+            else:
+                self.log(f"✗ {match['video'].name}: {message}")
+            done_now += 1
+
+        if done_now:
+            self._done_count += done_now
+            self.progress['value'] = self._done_count
+            self.status_label.config(text=f"进度: {self._done_count}/{self._merge_total}")
+
+        if finished:
+            self._finish_merge(self._merge_total)
+        else:
+            self.root.after(100, self._drain_progress)
+
+    def _finish_merge(self, total):
+        """主线程：合成结束后的收尾"""
+        success_count = self._success_count
+
+        self.log("="*60)
+        self.log(f"合成完成: {success_count}/{total} 成功")
+
+        self.is_running = False
+        self.scan_btn.config(state=tk.NORMAL)
+        self.preview_btn.config(state=tk.NORMAL)
+        self.merge_btn.config(state=tk.NORMAL)
+        self.stop_btn.config(state=tk.DISABLED)
+        self.status_label.config(text=f"完成: {success_count}/{total} 成功")
+
+        # 保存配置
+        self.save_config()
+
+        messagebox.showinfo("完成", f"合成完成!\n成功: {success_count}\n失败: {total - success_count}")
 
 
 def main():
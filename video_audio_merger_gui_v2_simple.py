@@ -8,11 +8,19 @@
 import os
 import sys
 import json
+import queue
+import shutil
 import subprocess
 import threading
+from collections import defaultdict, deque
 from pathlib import Path
-from difflib import SequenceMatcher
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# 可选的C加速相似度库：装了就启用相似匹配，没装保持纯精确匹配
+try:
+    from rapidfuzz import fuzz, process as rf_process
+except ImportError:
+    fuzz = rf_process = None
 
 # 导入tkinter
 try:
@@ -29,6 +37,13 @@ class VideoAudioMergerGUI:
     
     VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
     AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
+    # str.endswith接受元组且在C层一次比完，扫描分类用元组版省去切扩展名
+    VIDEO_SUFFIXES = tuple(sorted(VIDEO_EXTENSIONS))
+    AUDIO_SUFFIXES = tuple(sorted(AUDIO_EXTENSIONS))
+
+    # 每个ffmpeg进程合成的文件对数：视频流是copy，瓶颈在进程启动
+    # （Windows的CreateProcess尤其贵），分批把启动开销摊到多对上
+    BATCH_SIZE = 8
     
     def __init__(self, root):
         self.root = root
@@ -42,9 +57,16 @@ class VideoAudioMergerGUI:
         self.output_dir = tk.StringVar()
         self.output_suffix = tk.StringVar(value='_merged')
         self.use_source_as_output = tk.BooleanVar(value=True)
+        self.reencode_audio = tk.BooleanVar(value=False)
         
         self.matches = []
         self.is_running = False
+        # 上次写入的配置串，内容没变就跳过写盘
+        self._last_config_json = None
+        # 日志行数上限：Text内部是B树，无限追加会让插入和滚动越来越慢
+        self._log_lines = 0
+        # 工作线程不直接碰Tk：界面更新经此队列交回主线程批量处理
+        self.ui_queue = queue.Queue()
         
         # 配置文件
         self.config_file = Path.home() / '.video_audio_merger.json'
@@ -63,6 +85,7 @@ class VideoAudioMergerGUI:
                     self.source_dir.set(config.get('source_dir', ''))
                     self.output_dir.set(config.get('output_dir', ''))
                     self.output_suffix.set(config.get('output_suffix', '_merged'))
+                    self.reencode_audio.set(config.get('reencode_audio', False))
         except:
             pass
                 
@@ -74,9 +97,18 @@ class VideoAudioMergerGUI:
                 'source_dir': self.source_dir.get(),
                 'output_dir': self.output_dir.get(),
                 'output_suffix': self.output_suffix.get(),
+                'reencode_audio': self.reencode_audio.get(),
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            # 几个字段的小配置没必要走缩进美化那条Python路径，紧凑输出
+            text = json.dumps(config, ensure_ascii=False, separators=(',', ':'))
+            if text == self._last_config_json:
+                return
+            # 先写临时文件再替换，避免写一半时中断留下坏配置
+            tmp_file = self.config_file.with_suffix('.json.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_file, self.config_file)
+            self._last_config_json = text
         except:
             pass
             
@@ -145,6 +177,8 @@ class VideoAudioMergerGUI:
         
         ttk.Label(options_frame, text="输出后缀:").pack(side=tk.LEFT)
         ttk.Entry(options_frame, textvariable=self.output_suffix, width=15).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(options_frame, text="重新编码音频",
+                       variable=self.reencode_audio).pack(side=tk.LEFT, padx=15)
         
         # ===== 操作按钮 =====
         button_frame = ttk.Frame(main_frame)
@@ -208,9 +242,12 @@ class VideoAudioMergerGUI:
         """自动查找FFmpeg"""
         self.log("正在自动查找FFmpeg...")
         
-        # 常见路径
-        common_paths = []
-        if sys.platform == 'win32':
+        # PATH交给shutil.which一次查完（C实现、命中即停，Windows下还
+        # 认PATHEXT），找不到再试几个常见安装位置
+        found = shutil.which('ffmpeg')
+        if found:
+            common_paths = [Path(found)]
+        elif sys.platform == 'win32':
             common_paths = [
                 Path('C:/ffmpeg/bin/ffmpeg.exe'),
                 Path('D:/ffmpeg/bin/ffmpeg.exe'),
@@ -222,11 +259,6 @@ class VideoAudioMergerGUI:
                 Path('/usr/local/bin/ffmpeg'),
             ]
         
-        # 从PATH查找
-        for path in os.environ.get('PATH', '').split(os.pathsep):
-            exe = 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg'
-            common_paths.append(Path(path) / exe)
-        
         for path in common_paths:
             if path.exists():
                 self.ffmpeg_path.set(str(path))
@@ -272,11 +304,18 @@ class VideoAudioMergerGUI:
             
     def log(self, message):
         """添加日志"""
-        from datetime import datetime
         timestamp = datetime.now().strftime("%H:%M:%S")
         self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
+        self._trim_log(1)
         self.log_text.see(tk.END)
         self.root.update_idletasks()
+
+    def _trim_log(self, added):
+        """日志超过2000行就滚动删掉最旧的500行，控件大小保持有界"""
+        self._log_lines += added
+        if self._log_lines > 2000:
+            self.log_text.delete('1.0', '501.0')
+            self._log_lines -= 500
         
     def scan_files(self):
         """扫描文件"""
@@ -297,13 +336,31 @@ class VideoAudioMergerGUI:
         audio_files = []
         
         try:
-            for file_path in Path(directory).rglob('*'):
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in self.VIDEO_EXTENSIONS:
-                        video_files.append(file_path)
-                    elif ext in self.AUDIO_EXTENSIONS:
-                        audio_files.append(file_path)
+            # os.scandir迭代遍历：is_file/is_dir用目录读取时带回的类型信息，
+            # 不用逐个stat；Path对象只为扩展名命中的条目构造
+            dirs = deque([directory])
+            while dirs:
+                current = dirs.popleft()
+                try:
+                    entries = os.scandir(current)
+                except OSError:
+                    continue
+                # 同目录的媒体文件从同一个父Path拼出来，目录字符串只存
+                # 一份，不像Path(entry.path)那样每个文件各带一份完整路径
+                current_dir = Path(current)
+                with entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                dirs.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                name = entry.name.lower()
+                                if name.endswith(self.VIDEO_SUFFIXES):
+                                    video_files.append(current_dir / entry.name)
+                                elif name.endswith(self.AUDIO_SUFFIXES):
+                                    audio_files.append(current_dir / entry.name)
+                        except OSError:
+                            continue
         except Exception as e:
             messagebox.showerror("错误", f"扫描失败: {e}")
             return
@@ -329,28 +386,48 @@ class VideoAudioMergerGUI:
         self.merge_btn.config(state=tk.NORMAL)
         self.status_label.config(text=f"找到 {len(self.matches)} 对匹配文件")
         
+    # 相似匹配的最低得分（rapidfuzz按百分制）
+    SIMILARITY_CUTOFF = 70
+
     def match_files(self, video_files, audio_files):
-        """匹配文件"""
-        matches = []
-        matched_audio = set()
-        
-        # 完全匹配
-        audio_dict = {}
+        """匹配文件：先按主干完全匹配，剩余的用rapidfuzz做相似匹配（可选）"""
+        audio_by_stem = {}
         for audio in audio_files:
-            stem = audio.stem
-            if stem not in audio_dict:
-                audio_dict[stem] = []
-            audio_dict[stem].append(audio)
-            
-        for video in video_files:
-            video_stem = video.stem
-            if video_stem in audio_dict:
-                for audio in audio_dict[video_stem]:
-                    if str(audio) not in matched_audio:
-                        matches.append({'video': video, 'audio': audio})
-                        matched_audio.add(str(audio))
-                        break
-                        
+            audio_by_stem.setdefault(audio.stem, audio)
+
+        matches = [{'video': video, 'audio': audio_by_stem[video.stem]}
+                   for video in video_files if video.stem in audio_by_stem]
+
+        if rf_process is None:
+            return matches
+
+        matched_stems = {m['audio'].stem for m in matches}
+        leftover_videos = [v for v in video_files if v.stem not in audio_by_stem]
+        leftover_audios = [a for a in audio_files if a.stem not in matched_stems]
+        if not leftover_videos or not leftover_audios:
+            return matches
+
+        # 按主干长度//8分桶，每个视频只在相邻三个桶里找候选，
+        # 长度差太大的组合连C层的打分都不用进
+        buckets = defaultdict(list)
+        for audio in leftover_audios:
+            buckets[len(audio.stem) // 8].append(audio)
+
+        for video in leftover_videos:
+            k = len(video.stem) // 8
+            candidates = []
+            for b in (k - 1, k, k + 1):
+                candidates.extend(buckets.get(b, ()))
+            if not candidates:
+                continue
+            found = rf_process.extractOne(video.stem, [a.stem for a in candidates],
+                                          scorer=fuzz.ratio,
+                                          score_cutoff=self.SIMILARITY_CUTOFF)
+            if found:
+                audio = candidates[found[2]]
+                matches.append({'video': video, 'audio': audio})
+                buckets[len(audio.stem) // 8].remove(audio)
+
         return matches
         
     def preview_matches(self):
@@ -375,11 +452,12 @@ class VideoAudioMergerGUI:
         scrollbar = ttk.Scrollbar(preview_window, orient=tk.VERTICAL, command=tree.yview)
         tree.configure(yscrollcommand=scrollbar.set)
         
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
+        # 先填数据再pack：控件未显示时插入行不触发逐行重绘
         for i, match in enumerate(self.matches, 1):
             tree.insert('', tk.END, values=(i, match['video'].name, match['audio'].name))
+
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
             
     def start_merge(self):
         """开始合成"""
@@ -396,100 +474,244 @@ class VideoAudioMergerGUI:
         self.preview_btn.config(state=tk.DISABLED)
         self.merge_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
-        
-        thread = threading.Thread(target=self.merge_all)
+
+        self.progress['maximum'] = len(self.matches)
+        self.progress['value'] = 0
+
+        # Tk变量在主线程一次性快照：每次.get()都是一趟Tcl解释器调用，
+        # 而且从工作线程调用并不安全
+        ffmpeg = self.ffmpeg_path.get()
+        output_dir = self.output_dir.get()
+        use_source = self.use_source_as_output.get()
+        suffix = self.output_suffix.get()
+        reencode = self.reencode_audio.get()
+
+        thread = threading.Thread(target=self.merge_all,
+                                  args=(ffmpeg, output_dir, use_source, suffix, reencode))
         thread.daemon = True
         thread.start()
+
+        self.root.after(100, self._drain_ui)
         
     def stop_merge(self):
         """停止合成"""
         self.is_running = False
         self.log("正在停止...")
         
-    def merge_all(self):
-        """合成所有文件"""
-        suffix = self.output_suffix.get()
+    def merge_all(self, ffmpeg, output_dir, use_source, suffix, reencode):
+        """合成所有文件（分批：一个ffmpeg进程合成多对，摊薄进程启动开销）"""
+        import asyncio
+
         overwrite = False
-        
+
         total = len(self.matches)
         success_count = 0
-        
-        self.progress['maximum'] = total
-        self.progress['value'] = 0
-        
-        self.log(f"\n开始合成 {total} 个文件...")
-        
-        for match in self.matches:
-            if not self.is_running:
-                break
-                
-            try:
-                success, message = self.merge_single(match, suffix, overwrite)
+        done_count = 0
+
+        # 每个输出目录的现有文件名先读一次，批内判"已存在"变成O(1)的
+        # 集合查询，不再对每个输出stat一下
+        existing = {}
+        if not overwrite:
+            if use_source:
+                out_dirs = {str(match['video'].parent) for match in self.matches}
+            else:
+                out_dirs = {output_dir} if output_dir else set()
+            for d in out_dirs:
+                try:
+                    existing[d] = set(os.listdir(d))
+                except OSError:
+                    existing[d] = set()
+
+        self.ui_queue.put(('log', f"\n开始合成 {total} 个文件..."))
+
+        batches = [self.matches[i:i + self.BATCH_SIZE]
+                   for i in range(0, total, self.BATCH_SIZE)]
+
+        # 等待ffmpeg子进程的工作交给asyncio事件循环：等进程退出不占
+        # 线程，并发度由信号量控制，不用再养一个线程池
+        success_count = asyncio.run(self._merge_batches_async(
+            batches, ffmpeg, output_dir, use_source, suffix, reencode,
+            overwrite, existing, total))
+
+        self.ui_queue.put(('log', f"\n完成: {success_count}/{total} 成功"))
+        self.ui_queue.put(('done', success_count, total))
+
+    async def _merge_batches_async(self, batches, ffmpeg, output_dir, use_source,
+                                   suffix, reencode, overwrite, existing, total):
+        """在事件循环里跑所有批次，信号量维持原先的并发度"""
+        import asyncio
+
+        sem = asyncio.Semaphore(2)
+        success_count = 0
+        done_count = 0
+
+        async def run_batch(batch):
+            nonlocal success_count, done_count
+            async with sem:
+                if not self.is_running:
+                    return
+                try:
+                    results = await self.merge_batch(batch, ffmpeg, output_dir,
+                                                     use_source, suffix, reencode,
+                                                     overwrite, existing)
+                except Exception as e:
+                    results = [(match, False, str(e)) for match in batch]
+            for match, success, message in results:
                 if success:
                     success_count += 1
-                    self.log(f"✓ {match['video'].name}")
+                    self.ui_queue.put(('log', f"✓ {match['video'].name}"))
                 else:
-                    self.log(f"✗ {match['video'].name}: {message}")
-            except Exception as e:
-                self.log(f"✗ {match['video'].name}: {e}")
-                
-            self.progress['value'] += 1
-            self.status_label.config(text=f"进度: {self.progress['value']}/{total}")
-            self.root.update_idletasks()
-                    
-        self.log(f"\n完成: {success_count}/{total} 成功")
-        
+                    self.ui_queue.put(('log', f"✗ {match['video'].name}: {message}"))
+                done_count += 1
+            self.ui_queue.put(('progress', done_count))
+            self.ui_queue.put(('status', f"进度: {done_count}/{total}"))
+
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+        return success_count
+
+    def _drain_ui(self):
+        """主线程：批量取出工作线程的界面更新，日志拼成一次插入"""
+        logs = []
+        progress = None
+        status = None
+        done = None
+
+        while True:
+            try:
+                item = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = item[0]
+            if kind == 'log':
+                logs.append(item[1])
+            elif kind == 'progress':
+                progress = item[1]
+            elif kind == 'status':
+                status = item[1]
+            elif kind == 'done':
+                done = item[1:]
+
+        if logs:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            self.log_text.insert(tk.END, ''.join(f"[{timestamp}] {m}\n" for m in logs))
+            self._trim_log(len(logs))
+            self.log_text.see(tk.END)
+        if progress is not None:
+            self.progress['value'] = progress
+        if status is not None:
+            self.status_label.config(text=status)
+
+        if done is not None:
+            self._merge_done(*done)
+            return
+        self.root.after(100, self._drain_ui)
+
+    def _merge_done(self, success_count, total):
+        """主线程：合成收尾"""
         self.is_running = False
         self.scan_btn.config(state=tk.NORMAL)
         self.preview_btn.config(state=tk.NORMAL)
         self.merge_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_label.config(text=f"完成: {success_count}/{total} 成功")
-        
+
         self.save_config()
-        
+
         messagebox.showinfo("完成", f"合成完成!\n成功: {success_count}\n失败: {total - success_count}")
         
-    def merge_single(self, match, suffix, overwrite):
-        """合成单个文件"""
-        video = match['video']
-        audio = match['audio']
-        
-        if self.use_source_as_output.get():
-            output_path = video.parent / f"{video.stem}{suffix}{video.suffix}"
-        else:
-            output_dir = self.output_dir.get()
-            if not output_dir:
-                return False, "未设置输出目录"
-            output_path = Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
-            
-        if output_path.exists() and not overwrite:
-            return False, "文件已存在"
-            
-        cmd = [
-            self.ffmpeg_path.get(),
-            '-i', str(video),
-            '-i', str(audio),
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-map', '0:v:0',
-            '-map', '1:a:0',
-            '-shortest',
-            '-y' if overwrite else '-n',
-            str(output_path)
-        ]
-        
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', 
-                                   errors='ignore', timeout=300)
-            
-            if result.returncode == 0:
-                return True, str(output_path)
+    @staticmethod
+    def output_path_for(video, output_dir, use_source, suffix):
+        """计算单个视频的输出路径，输出目录未设置时返回None"""
+        if use_source:
+            return video.parent / f"{video.stem}{suffix}{video.suffix}"
+        if not output_dir:
+            return None
+        return Path(output_dir) / f"{video.stem}{suffix}{video.suffix}"
+
+    @staticmethod
+    def audio_codec_args(audio, reencode):
+        """音轨编码参数：B站下载的音轨本来就是AAC，默认直接复制成纯封装"""
+        if reencode:
+            return ['-c:a', 'aac']
+        ext = audio.suffix.lower()
+        if ext == '.m4a':
+            return ['-c:a', 'copy']
+        if ext == '.aac':
+            # ADTS裸流进mp4系容器要换一下封装头
+            return ['-c:a', 'copy', '-bsf:a', 'aac_adtstoasc']
+        return ['-c:a', 'aac']
+
+    async def merge_batch(self, batch, ffmpeg, output_dir, use_source, suffix, reencode,
+                          overwrite, existing=None):
+        """用一个ffmpeg进程合成一批文件对，按输出文件是否生成判断各对成败"""
+        import asyncio
+
+        results = []
+        runnable = []
+
+        for match in batch:
+            output_path = self.output_path_for(match['video'], output_dir, use_source, suffix)
+            if output_path is None:
+                results.append((match, False, "未设置输出目录"))
+            elif not overwrite and output_path.name in (existing or {}).get(str(output_path.parent), ()):
+                results.append((match, False, "文件已存在"))
             else:
-                error = result.stderr[-200:] if result.stderr else "未知错误"
-                return False, error
+                runnable.append((match, output_path))
+
+        if not runnable:
+            return results
+
+        # 所有输入成对排开，每个输出各自映射对应的视频流和音频流。
+        # 音轨要重编码的输出限制编码线程数：并发跑多个ffmpeg，各自
+        # 再起一把aac编码线程会超订CPU核；纯copy本来就单线程，不受影响。
+        # -threads是位置相关的，必须放进各输出的选项组才作用于编码器，
+        # 放在-i之前只会限制输入的解码线程
+        cmd = [ffmpeg, '-y' if overwrite else '-n']
+        for match, _ in runnable:
+            cmd += ['-i', str(match['video']), '-i', str(match['audio'])]
+        for i, (match, output_path) in enumerate(runnable):
+            codec_args = self.audio_codec_args(match['audio'], reencode)
+            cmd += [
+                '-map', f'{2 * i}:v:0',
+                '-map', f'{2 * i + 1}:a:0',
+                '-c:v', 'copy',
+                *codec_args,
+            ]
+            if 'copy' not in codec_args:
+                cmd += ['-threads', '1']
+            cmd += ['-shortest', str(output_path)]
+
+        # stdout直接丢给DEVNULL：ffmpeg的正常输出全在stderr。
+        # stderr按字节收，只在失败时解码末尾——长视频的进度行可达
+        # 兆级，没必要整流做UTF-8解码
+        error = "未知错误"
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await asyncio.wait_for(proc.communicate(),
+                                                   timeout=300 * len(runnable))
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.communicate()
+                raise
+            if proc.returncode != 0 and stderr:
+                error = stderr[-200:].decode('utf-8', 'ignore')
         except Exception as e:
-            return False, str(e)
+            error = str(e)
+
+        for match, output_path in runnable:
+            try:
+                ok = output_path.exists() and output_path.stat().st_size > 0
+            except OSError:
+                ok = False
+            if ok:
+                results.append((match, True, str(output_path)))
+            else:
+                results.append((match, False, error))
+        return results
             
     def on_closing(self):
         """窗口关闭"""
@@ -8,12 +8,13 @@
 import os
 import sys
 import json
+import queue
 import subprocess
 import threading
 import re
 import time
+from collections import deque
 from pathlib import Path
-from difflib import SequenceMatcher
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
@@ -25,6 +26,47 @@ except ImportError:
     sys.exit(1)
 
 
+# stderr每行都要过这些模式，编译一次放模块级，免得每行都查re内部缓存。
+# 进度行的四个字段并成一个带分支的模式，一次finditer扫完整行，
+# 不再做四趟独立的NFA遍历
+_DURATION_RE = re.compile(r'Duration: (\d+):(\d+):(\d+\.\d+)')
+# 归一化匹配时去掉文件名里的括号标签，如 [1080P]、(Av12345)
+_TAG_RE = re.compile(r'[\[\(].*?[\]\)]')
+_PROG_RE = re.compile(r'time=(\d+):(\d+):(\d+\.\d+)'
+                      r'|frame=\s*(\d+)'
+                      r'|fps=\s*(\d+)'
+                      r'|speed=\s*([\d.]+)x')
+
+
+def _walk_files(root, max_entries=None):
+    """迭代遍历目录树，逐个产出文件DirEntry
+
+    scandir的is_file/is_dir直接用读目录时带回的类型信息，不像rglob
+    那样每个条目都要构造Path再stat一次。max_entries限制产出的文件
+    总数，用于只需要抽样的场合。
+    """
+    stack = [root]
+    produced = 0
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+                        produced += 1
+                        if max_entries is not None and produced >= max_entries:
+                            return
+                except OSError:
+                    continue
+
+
 class FFmpegProgress:
     """FFmpeg进度解析器"""
     
@@ -38,9 +80,11 @@ class FFmpegProgress:
         self.percentage = 0
         
     def parse_duration(self, line):
-        """从FFmpeg输出解析视频时长"""
+        """从FFmpeg输出解析视频时长；已解析过就直接返回，不再跑正则"""
+        if self.duration > 0:
+            return True
         # Duration: 00:05:30.50
-        match = re.search(r'Duration: (\d+):(\d+):(\d+\.\d+)', line)
+        match = _DURATION_RE.search(line)
         if match:
             hours = int(match.group(1))
             minutes = int(match.group(2))
@@ -54,29 +98,24 @@ class FFmpegProgress:
         # frame=  500 fps=120 q=-1.0 size=    5000kB time=00:00:20.50 bitrate=...
         updated = False
         
-        # 解析时间
-        time_match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', line)
-        if time_match:
-            hours = int(time_match.group(1))
-            minutes = int(time_match.group(2))
-            seconds = float(time_match.group(3))
-            self.current_time = hours * 3600 + minutes * 60 + seconds
-            updated = True
-            
-        # 解析帧数
-        frame_match = re.search(r'frame=\s*(\d+)', line)
-        if frame_match:
-            self.frame = int(frame_match.group(1))
-            
-        # 解析fps
-        fps_match = re.search(r'fps=\s*(\d+)', line)
-        if fps_match:
-            self.fps = int(fps_match.group(1))
-            
-        # 解析速度
-        speed_match = re.search(r'speed=\s*([\d.]+)x', line)
-        if speed_match:
-            self.speed = float(speed_match.group(1))
+        # 只有进度行才带frame=，头部信息行用一次子串查找就能全跳过
+        if 'frame=' in line:
+            # lastindex是命中的最后一个分组号：时间分支占1-3，
+            # 帧数、fps、速度分别是4、5、6
+            for match in _PROG_RE.finditer(line):
+                idx = match.lastindex
+                if idx == 3:
+                    hours = int(match.group(1))
+                    minutes = int(match.group(2))
+                    seconds = float(match.group(3))
+                    self.current_time = hours * 3600 + minutes * 60 + seconds
+                    updated = True
+                elif idx == 4:
+                    self.frame = int(match.group(4))
+                elif idx == 5:
+                    self.fps = int(match.group(5))
+                elif idx == 6:
+                    self.speed = float(match.group(6))
             
         # 计算百分比
         if self.duration > 0 and self.current_time > 0:
@@ -99,8 +138,15 @@ class FFmpegProgress:
 class VideoAudioMergerGUI:
     """视频音频合成工具 - 带进度显示"""
     
-    VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
-    AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'}
+    # frozenset免掉可变set的写保护开销，成员intern后哈希命中多走
+    # 身份比较的快路径
+    VIDEO_EXTENSIONS = frozenset(sys.intern(e) for e in (
+        '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'))
+    AUDIO_EXTENSIONS = frozenset(sys.intern(e) for e in (
+        '.m4a', '.mp3', '.aac', '.wav', '.flac', '.ogg', '.wma', '.mka'))
+
+    # 每个ffmpeg进程里编码侧的线程数；音频编码本就是单线程，留作可改
+    ENCODER_THREADS = 1
     
     def __init__(self, root):
         self.root = root
@@ -120,6 +166,15 @@ class VideoAudioMergerGUI:
         self.is_running = False
         self.current_progress = {}  # 存储每个文件的进度
         self.progress_lock = threading.Lock()
+        self._pool_size = 1  # 本次合成的并发进程数，start_merge里按任务数定
+        self._codec_cache = {}  # 音轨编码探测结果，按路径缓存
+        # 工作线程的界面事件都投到这里，主线程定时批量取用
+        self._ui_queue = queue.Queue()
+        self._verified = {}  # 验证过的ffmpeg：(路径, mtime_ns) -> 状态文本
+        # 日志先进缓冲，事件泵每趟拼成一次插入；工作线程也可以直接log
+        self._log_buf = deque()
+        self._log_lock = threading.Lock()
+        self._log_lines = 0
         
         # 配置文件
         self.config_file = Path.home() / '.video_audio_merger_v3.json'
@@ -277,8 +332,8 @@ class VideoAudioMergerGUI:
         self.detail_frame = ttk.Frame(progress_frame)
         self.detail_frame.pack(fill=tk.X, pady=5)
         
-        # 创建进度标签字典
-        self.progress_labels = {}
+        # 详细进度列表控件，扫描后由create_progress_widgets创建
+        self._progress_tree = None
         
         # ===== 日志区域 =====
         log_frame = ttk.LabelFrame(main_frame, text=" 日志 ", padding="5")
@@ -297,25 +352,55 @@ class VideoAudioMergerGUI:
         # 关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # 启动进度更新定时器
-        self.update_progress_ui()
+        # 启动界面事件泵
+        self._drain_ui()
+        
+    def _drain_ui(self):
+        """主线程：批量取出工作线程的界面事件，同一文件的进度只留最新"""
+        logs = []
+        progress_events = {}
+        total_event = None
+        scan_event = None
+        for _ in range(50):  # 单次最多处理50个事件，不让界面卡在取队列上
+            try:
+                event = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == 'log':
+                logs.append(event[1])
+            elif kind == 'progress':
+                progress_events[event[1]] = event
+            elif kind == 'total':
+                total_event = event
+            elif kind == 'scan_done':
+                scan_event = event
+        
+        for message in logs:
+            self.log(message)
+        self._flush_log()
+        for filename, (_, _, progress_text, percentage) in progress_events.items():
+            self._update_current_file(filename, progress_text, percentage)
+        if total_event is not None:
+            self._update_total_progress(total_event[1], total_event[2])
+        if scan_event is not None:
+            self._scan_done(*scan_event[1:])
         
-    def update_progress_ui(self):
-        """定时更新进度UI"""
         if self.is_running and self.show_detailed_progress.get():
             self.refresh_progress_display()
-        self.root.after(500, self.update_progress_ui)  # 每500ms更新一次
+        self.root.after(100, self._drain_ui)
         
     def refresh_progress_display(self):
-        """刷新进度显示"""
+        """刷新进度显示：只改Treeview单元格文本，不逐个碰控件"""
+        tree = self._progress_tree
+        if tree is None:
+            return
         with self.progress_lock:
             for filename, info in self.current_progress.items():
-                if filename in self.progress_labels:
-                    label, progress_var = self.progress_labels[filename]
-                    progress_text = info.get('text', '处理中...')
+                if tree.exists(filename):
                     percentage = info.get('percentage', 0)
-                    label.config(text=f"{filename}: {progress_text}")
-                    progress_var.set(percentage)
+                    progress_text = info.get('text', '处理中...')
+                    tree.set(filename, 'progress', f"{percentage:5.1f}% {progress_text}")
                     
     def toggle_output(self):
         """切换输出模式"""
@@ -329,6 +414,7 @@ class VideoAudioMergerGUI:
         filetypes = [('可执行文件', '*.exe')] if sys.platform == 'win32' else [('所有文件', '*.*')]
         path = filedialog.askopenfilename(title="选择 FFmpeg", filetypes=filetypes)
         if path:
+            self._verified.clear()
             self.ffmpeg_path.set(path)
             self.verify_ffmpeg()
             
@@ -354,7 +440,7 @@ class VideoAudioMergerGUI:
             common_paths.append(Path(path) / exe)
         
         for path in common_paths:
-            if path.exists():
+            if path.is_file():
                 self.ffmpeg_path.set(str(path))
                 if self.verify_ffmpeg():
                     self.log(f"✓ 找到FFmpeg: {path}")
@@ -397,19 +483,33 @@ class VideoAudioMergerGUI:
                 home / 'Videos',
             ]
         
-        # 扫描每个目录
+        # 扫描每个目录。候选按真实路径去重：符号链接/挂载可能让两个
+        # 候选指向同一处，嵌在已扫过目录里的候选也不再重复遍历那棵子树
+        seen_roots = []
         for folder in common_paths:
             if folder.exists():
+                try:
+                    real = os.path.realpath(folder).rstrip(os.sep) + os.sep
+                except OSError:
+                    continue
+                if any(real.startswith(prev) for prev in seen_roots):
+                    continue
+                seen_roots.append(real)
                 video_count = 0
                 audio_count = 0
                 try:
-                    for file_path in folder.rglob('*'):
-                        if file_path.is_file():
-                            ext = file_path.suffix.lower()
-                            if ext in self.VIDEO_EXTENSIONS:
-                                video_count += 1
-                            elif ext in self.AUDIO_EXTENSIONS:
-                                audio_count += 1
+                    # 判断"像不像媒体目录"抽样2000个文件就够了，下载目录
+                    # 动辄几万个条目，没必要走完整棵树
+                    for entry in _walk_files(str(folder), max_entries=2000):
+                        name = entry.name
+                        dot = name.rfind('.')
+                        if dot <= 0:
+                            continue
+                        ext = name[dot:].lower()
+                        if ext in self.VIDEO_EXTENSIONS:
+                            video_count += 1
+                        elif ext in self.AUDIO_EXTENSIONS:
+                            audio_count += 1
                         if video_count + audio_count > 1000:  # 限制扫描数量
                             break
                 except:
@@ -445,12 +545,25 @@ class VideoAudioMergerGUI:
         if not path or not Path(path).exists():
             self.ffmpeg_status.config(text="状态: FFmpeg 路径无效", foreground="red")
             return False
+        
+        # 同一个可执行文件验证过一次就记住，反复点验证和每次开始合成
+        # 不再都起一个ffmpeg -version进程；文件换了（mtime变）会重验
+        try:
+            key = (path, Path(path).stat().st_mtime_ns)
+        except OSError:
+            key = None
+        if key is not None and key in self._verified:
+            self.ffmpeg_status.config(text=self._verified[key], foreground="green")
+            return True
             
         try:
             result = subprocess.run([path, '-version'], capture_output=True, text=True, timeout=5)
             if result.returncode == 0:
                 version = result.stdout.split('\n')[0]
-                self.ffmpeg_status.config(text=f"✓ {version[:50]}...", foreground="green")
+                status_text = f"✓ {version[:50]}..."
+                self.ffmpeg_status.config(text=status_text, foreground="green")
+                if key is not None:
+                    self._verified[key] = status_text
                 self.save_config()
                 return True
             else:
@@ -461,14 +574,27 @@ class VideoAudioMergerGUI:
             return False
             
     def log(self, message):
-        """添加日志"""
+        """添加日志：只进缓冲，由界面事件泵统一刷到文本框，线程安全"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
+        with self._log_lock:
+            self._log_buf.append(f"[{timestamp}] {message}\n")
+        
+    def _flush_log(self):
+        """主线程：积累的日志拼成一次插入，超长时滚动删掉最旧的行"""
+        with self._log_lock:
+            if not self._log_buf:
+                return
+            text = ''.join(self._log_buf)
+            self._log_buf.clear()
+        self.log_text.insert(tk.END, text)
+        self._log_lines += text.count('\n')
+        if self._log_lines > 10000:
+            self.log_text.delete('1.0', '5001.0')
+            self._log_lines -= 5000
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
         
     def scan_files(self):
-        """扫描文件"""
+        """扫描文件：遍历和匹配放到后台线程，大目录不卡住窗口"""
         directory = self.source_dir.get()
         if not directory:
             messagebox.showwarning("警告", "请先选择源目录")
@@ -480,114 +606,155 @@ class VideoAudioMergerGUI:
             
         self.log(f"正在扫描: {directory}")
         self.status_label.config(text="正在扫描...")
+        self.scan_btn.config(state=tk.DISABLED)
         
         # 清空之前的进度显示
         for widget in self.detail_frame.winfo_children():
             widget.destroy()
-        self.progress_labels.clear()
+        self._progress_tree = None
         
-        # 扫描文件
+        thread = threading.Thread(target=self._scan_worker, args=(directory,))
+        thread.daemon = True
+        thread.start()
+        
+    def _scan_worker(self, directory):
+        """后台线程：遍历目录并匹配，结果经事件队列交回主线程"""
         video_files = []
         audio_files = []
         
         try:
-            for file_path in Path(directory).rglob('*'):
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in self.VIDEO_EXTENSIONS:
-                        video_files.append(file_path)
-                    elif ext in self.AUDIO_EXTENSIONS:
-                        audio_files.append(file_path)
+            # 扩展名在原始文件名字符串上判断，Path对象只为命中的条目构造
+            for entry in _walk_files(directory):
+                name = entry.name
+                dot = name.rfind('.')
+                if dot <= 0:
+                    continue
+                ext = name[dot:].lower()
+                if ext in self.VIDEO_EXTENSIONS:
+                    video_files.append(Path(entry.path))
+                elif ext in self.AUDIO_EXTENSIONS:
+                    audio_files.append(Path(entry.path))
         except Exception as e:
-            messagebox.showerror("错误", f"扫描失败: {e}")
+            self._ui_queue.put(('scan_done', 0, 0, None, f"扫描失败: {e}"))
             return
-                        
-        self.log(f"视频: {len(video_files)}, 音频: {len(audio_files)}")
         
-        if not video_files or not audio_files:
-            messagebox.showinfo("提示", "需要同时存在视频和音频文件")
+        if video_files and audio_files:
+            matches = self.match_files(video_files, audio_files)
+        else:
+            matches = []
+        self._ui_queue.put(('scan_done', len(video_files), len(audio_files), matches, None))
+        
+    def _scan_done(self, video_count, audio_count, matches, error):
+        """主线程：扫描收尾，更新按钮和进度列表"""
+        self.scan_btn.config(state=tk.NORMAL)
+        
+        if error:
+            self.status_label.config(text="就绪")
+            messagebox.showerror("错误", error)
             return
             
-        # 匹配文件
-        self.matches = self.match_files(video_files, audio_files)
+        self.log(f"视频: {video_count}, 音频: {audio_count}")
         
-        if not self.matches:
+        if not video_count or not audio_count:
+            self.status_label.config(text="就绪")
+            messagebox.showinfo("提示", "需要同时存在视频和音频文件")
+            return
+            
+        if not matches:
             self.log("未找到匹配的文件对")
+            self.status_label.config(text="就绪")
             messagebox.showinfo("提示", "未找到匹配的文件对")
             return
             
-        self.log(f"找到 {len(self.matches)} 对匹配文件")
+        self.matches = matches
+        self.log(f"找到 {len(matches)} 对匹配文件")
         
         # 创建进度显示
         self.create_progress_widgets()
         
         self.preview_btn.config(state=tk.NORMAL)
         self.merge_btn.config(state=tk.NORMAL)
-        self.status_label.config(text=f"找到 {len(self.matches)} 对匹配文件")
+        self.status_label.config(text=f"找到 {len(matches)} 对匹配文件")
         
     def create_progress_widgets(self):
-        """为每个匹配文件创建进度显示"""
+        """创建进度列表：一个Treeview装下全部文件
+
+        原来每个文件一组Frame+Label+Progressbar，几百个文件就是几百个
+        Tk控件；换成单个Treeview后控件数量不随文件数增长，刷新也只是
+        改单元格文本。
+        """
         # 清空旧的小部件
         for widget in self.detail_frame.winfo_children():
             widget.destroy()
-        self.progress_labels.clear()
+        self._progress_tree = None
         
         if not self.show_detailed_progress.get():
             return
             
-        # 创建滚动区域
-        canvas = tk.Canvas(self.detail_frame, height=150)
-        scrollbar = ttk.Scrollbar(self.detail_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        tree = ttk.Treeview(self.detail_frame, columns=('file', 'progress'),
+                            show='headings', height=8)
+        tree.heading('file', text='文件')
+        tree.heading('progress', text='进度')
+        tree.column('file', width=450)
+        tree.column('progress', width=250)
+        
+        scrollbar = ttk.Scrollbar(self.detail_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
         
-        # 为每个文件创建进度条
         for match in self.matches:
             filename = match['video'].name
+            if not tree.exists(filename):
+                tree.insert('', tk.END, iid=filename, values=(filename, '等待中...'))
             
-            frame = ttk.Frame(scrollable_frame)
-            frame.pack(fill=tk.X, pady=2)
-            
-            label = ttk.Label(frame, text=f"{filename}: 等待中...", width=60)
-            label.pack(side=tk.LEFT)
-            
-            progress_var = tk.DoubleVar(value=0)
-            progress_bar = ttk.Progressbar(frame, variable=progress_var, mode='determinate', length=150)
-            progress_bar.pack(side=tk.LEFT, padx=5)
-            
-            self.progress_labels[filename] = (label, progress_var)
-            
-        canvas.pack(side="left", fill="both", expand=True)
+        tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
+        self._progress_tree = tree
         
     def match_files(self, video_files, audio_files):
-        """匹配文件"""
+        """匹配文件：先按主干完全匹配，再按归一化主干兜底，全程哈希查找"""
         matches = []
         matched_audio = set()
+        matched_video = set()
+        
+        # 主干只从Path里取一次并intern：.stem每次访问都要重新切一遍
+        # 路径字符串，intern之后字典探测还能先走身份比较
+        audio_items = [(sys.intern(audio.stem), audio) for audio in audio_files]
+        video_items = [(sys.intern(video.stem), video) for video in video_files]
         
         # 完全匹配
         audio_dict = {}
-        for audio in audio_files:
-            stem = audio.stem
-            if stem not in audio_dict:
-                audio_dict[stem] = []
-            audio_dict[stem].append(audio)
-            
-        for video in video_files:
-            video_stem = video.stem
-            if video_stem in audio_dict:
-                for audio in audio_dict[video_stem]:
+        for stem, audio in audio_items:
+            audio_dict.setdefault(stem, []).append(audio)
+            
+        for stem, video in video_items:
+            bucket = audio_dict.get(stem)
+            if bucket:
+                for audio in bucket:
                     if str(audio) not in matched_audio:
                         matches.append({'video': video, 'audio': audio})
                         matched_audio.add(str(audio))
+                        matched_video.add(str(video))
                         break
+        
+        # 第二轮：主干去括号标签、转小写后再按字典探测。仍是O(V+A)的
+        # 哈希查找，不做逐对相似度打分那种平方级比较
+        norm_audio_dict = {}
+        for stem, audio in audio_items:
+            if str(audio) in matched_audio:
+                continue
+            norm = _TAG_RE.sub('', stem).lower().strip()
+            if norm:
+                norm_audio_dict.setdefault(norm, []).append(audio)
+                
+        for stem, video in video_items:
+            if str(video) in matched_video:
+                continue
+            norm = _TAG_RE.sub('', stem).lower().strip()
+            for audio in norm_audio_dict.get(norm, ()):
+                if str(audio) not in matched_audio:
+                    matches.append({'video': video, 'audio': audio})
+                    matched_audio.add(str(audio))
+                    break
                         
         return matches
         
@@ -631,6 +798,7 @@ class VideoAudioMergerGUI:
             
         self.is_running = True
         self.current_progress.clear()
+        self._pool_size = min(os.cpu_count() or 2, len(self.matches))
         self.scan_btn.config(state=tk.DISABLED)
         self.preview_btn.config(state=tk.DISABLED)
         self.merge_btn.config(state=tk.DISABLED)
@@ -645,54 +813,74 @@ class VideoAudioMergerGUI:
         thread.daemon = True
         thread.start()
         
+    def _update_total_progress(self, done_count, total):
+        """主线程：更新总进度条和状态栏"""
+        self.total_progress_bar['value'] = done_count
+        self.total_progress_label.config(text=f"总进度: {done_count}/{total}")
+        self.status_label.config(text=f"进度: {done_count}/{total}")
+        
+    def _update_current_file(self, filename, progress_text, percentage):
+        """主线程：更新当前文件进度条和标签"""
+        self.current_progress_bar['value'] = percentage
+        self.current_file_label.config(text=f"当前: {filename} - {progress_text}")
+        
     def stop_merge(self):
         """停止合成"""
         self.is_running = False
         self.log("正在停止...")
         
     def merge_all(self):
-        """合成所有文件"""
+        """合成所有文件：线程池并行，每个文件各起一个ffmpeg进程"""
         suffix = self.output_suffix.get()
         overwrite = False
         
         total = len(self.matches)
         completed = 0
+        done_count = 0
         
         self.log(f"\n开始合成 {total} 个文件...")
         
-        for i, match in enumerate(self.matches):
-            if not self.is_running:
-                break
-                
-            filename = match['video'].name
-            self.current_file_label.config(text=f"当前: {filename}")
-            self.current_progress_bar['value'] = 0
-            
-            # 更新进度状态
-            with self.progress_lock:
-                self.current_progress[filename] = {'text': '开始处理...', 'percentage': 0}
+        # 视频流是copy、音频编码单线程，瓶颈在每个文件各自的编码+封装，
+        # 文件之间互不依赖，按核数并行
+        with ThreadPoolExecutor(max_workers=self._pool_size) as executor:
+            futures = {}
+            for i, match in enumerate(self.matches):
+                if not self.is_running:
+                    break
+                filename = match['video'].name
+                # 每个文件只分配这一个字典，之后所有进度更新都原地改字段
+                with self.progress_lock:
+                    self.current_progress[filename] = {'text': '等待中...', 'percentage': 0}
+                future = executor.submit(self.merge_single_with_progress,
+                                         match, suffix, overwrite, i)
+                futures[future] = match
             
-            try:
-                success = self.merge_single_with_progress(match, suffix, overwrite, i)
-                if success:
-                    completed += 1
-                    self.log(f"✓ {filename}")
-                    with self.progress_lock:
-                        self.current_progress[filename] = {'text': '完成', 'percentage': 100}
-                else:
-                    self.log(f"✗ {filename}")
+            for future in as_completed(futures):
+                filename = futures[future]['video'].name
+                try:
+                    success = future.result()
+                    if success:
+                        completed += 1
+                        self._ui_queue.put(('log', f"✓ {filename}"))
+                        with self.progress_lock:
+                            info = self.current_progress[filename]
+                            info['text'] = '完成'
+                            info['percentage'] = 100
+                    else:
+                        self._ui_queue.put(('log', f"✗ {filename}"))
+                        with self.progress_lock:
+                            info = self.current_progress[filename]
+                            info['text'] = '失败'
+                            info['percentage'] = 0
+                except Exception as e:
+                    self._ui_queue.put(('log', f"✗ {filename}: {e}"))
                     with self.progress_lock:
-                        self.current_progress[filename] = {'text': '失败', 'percentage': 0}
-            except Exception as e:
-                self.log(f"✗ {filename}: {e}")
-                with self.progress_lock:
-                    self.current_progress[filename] = {'text': f'错误: {e}', 'percentage': 0}
+                        info = self.current_progress[filename]
+                        info['text'] = f'错误: {e}'
+                        info['percentage'] = 0
                 
-            completed_count = i + 1
-            self.total_progress_bar['value'] = completed_count
-            self.total_progress_label.config(text=f"总进度: {completed_count}/{total}")
-            self.status_label.config(text=f"进度: {completed_count}/{total}")
-            self.root.update_idletasks()
+                done_count += 1
+                self._ui_queue.put(('total', done_count, total))
                     
         self.log(f"\n完成: {completed}/{total} 成功")
         
@@ -708,6 +896,26 @@ class VideoAudioMergerGUI:
         
         messagebox.showinfo("完成", f"合成完成!\n成功: {completed}\n失败: {total - completed}")
         
+    def _probe_audio_codec(self, audio):
+        """用ffprobe探测音轨编码，结果按路径缓存；探测不了返回空串"""
+        key = str(audio)
+        if key in self._codec_cache:
+            return self._codec_cache[key]
+        codec = ''
+        ffmpeg = Path(self.ffmpeg_path.get())
+        ffprobe = ffmpeg.with_name(ffmpeg.name.replace('ffmpeg', 'ffprobe'))
+        if ffprobe.exists():
+            try:
+                out = subprocess.check_output(
+                    [str(ffprobe), '-v', 'error', '-select_streams', 'a:0',
+                     '-show_entries', 'stream=codec_name', '-of', 'csv=p=0', key],
+                    timeout=10)
+                codec = out.decode('utf-8', 'ignore').strip()
+            except Exception:
+                pass
+        self._codec_cache[key] = codec
+        return codec
+
     def merge_single_with_progress(self, match, suffix, overwrite, index):
         """合成单个文件并显示进度"""
         video = match['video']
@@ -725,14 +933,29 @@ class VideoAudioMergerGUI:
         if output_path.exists() and not overwrite:
             return False
             
+        # 音轨已是目标容器支持的编码就直接copy成纯封装，整条AAC重编码
+        # （单文件里最贵的一步）就省掉了；探测不出来才保守重编码
+        codec = self._probe_audio_codec(audio)
+        if codec in ('aac', 'mp3', 'ac3') and output_path.suffix.lower() in ('.mp4', '.m4v', '.mkv'):
+            audio_args = ['-c:a', 'copy']
+        else:
+            audio_args = ['-c:a', 'aac']
+
+        # 解码线程按并发进程数摊分，合计约等于核数；不限的话每个ffmpeg
+        # 默认都按核数开线程，N个进程一起跑就超订了
+        threads = max(1, (os.cpu_count() or 2) // max(1, self._pool_size))
         cmd = [
             self.ffmpeg_path.get(),
+            # 结构化进度流走stdout，顺便关掉stderr上人读的统计行刷屏
+            '-progress', 'pipe:1', '-nostats',
+            '-threads', str(threads),
             '-i', str(video),
             '-i', str(audio),
             '-c:v', 'copy',
-            '-c:a', 'aac',
+            *audio_args,
             '-map', '0:v:0',
             '-map', '1:a:0',
+            '-threads', str(self.ENCODER_THREADS),
             '-shortest',
             '-y' if overwrite else '-n',
             str(output_path)
@@ -754,39 +977,78 @@ class VideoAudioMergerGUI:
             process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='ignore',
-                bufsize=1
+                stderr=subprocess.PIPE,
+                bufsize=0
             )
             
+            # stderr单独开条小线程消化：开头的Duration在这边解析一次，
+            # 之后只负责把编码器的杂音读空，stdout上就只剩key=value行
+            def read_stderr():
+                for raw in process.stderr:
+                    if progress.duration == 0:
+                        progress.parse_duration(raw.decode('utf-8', 'ignore'))
+            stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+            stderr_thread.start()
+            
             last_update = time.time()
             
-            for line in process.stdout:
-                # 解析时长（只在开始时）
-                if progress.duration == 0:
-                    progress.parse_duration(line)
-                
-                # 解析进度
-                if progress.parse_progress(line):
-                    # 更新进度（限制更新频率）
-                    current_time = time.time()
-                    if current_time - last_update > 0.5:  # 每0.5秒更新一次UI
-                        progress_text = progress.get_progress_text()
-                        with self.progress_lock:
-                            self.current_progress[filename] = {
-                                'text': progress_text,
-                                'percentage': progress.percentage
-                            }
-                        
-                        # 更新当前进度条
-                        self.current_progress_bar['value'] = progress.percentage
-                        self.current_file_label.config(text=f"当前: {filename} - {progress_text}")
-                        self.root.update_idletasks()
-                        last_update = current_time
+            # 二进制整块读进bytearray再按\n切行：文本模式按行迭代每行都
+            # 要过一遍增量解码器，而进度行又都很短；整块读之后每行只做
+            # 一次很短的decode
+            fd = process.stdout.fileno()
+            buf = bytearray()
+            ended = False
+            while not ended:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    break
+                buf.extend(chunk)
+                while True:
+                    nl = buf.find(b'\n')
+                    if nl < 0:
+                        break
+                    line = bytes(buf[:nl]).decode('utf-8', 'ignore')
+                    del buf[:nl + 1]
+                    
+                    key, _, value = line.strip().partition('=')
+                    if key == 'out_time_ms':
+                        try:
+                            progress.current_time = max(0, int(value)) / 1e6
+                        except ValueError:
+                            continue
+                        if progress.duration > 0:
+                            progress.percentage = min(100, (progress.current_time / progress.duration) * 100)
+                        # 更新进度（限制更新频率）
+                        current_time = time.time()
+                        if current_time - last_update > 0.5:  # 每0.5秒更新一次UI
+                            progress_text = progress.get_progress_text()
+                            with self.progress_lock:
+                                info = self.current_progress[filename]
+                                info['text'] = progress_text
+                                info['percentage'] = progress.percentage
+                            
+                            # Tk不允许从工作线程直接碰控件，投到事件队列
+                            self._ui_queue.put(('progress', filename, progress_text,
+                                                progress.percentage))
+                            last_update = current_time
+                    elif key == 'frame' and value.isdigit():
+                        progress.frame = int(value)
+                    elif key == 'fps':
+                        try:
+                            progress.fps = int(float(value))
+                        except ValueError:
+                            pass
+                    elif key == 'speed' and value.endswith('x'):
+                        try:
+                            progress.speed = float(value[:-1])
+                        except ValueError:
+                            pass
+                    elif key == 'progress' and value == 'end':
+                        ended = True
+                        break
             
             process.wait(timeout=300)
+            stderr_thread.join(timeout=5)
             return process.returncode == 0
             
         except Exception as e: